@@ -0,0 +1,17 @@
+import sys
+
+import yaid
+
+
+def test_static_resolver_nested_namespace_package(tmp_path, monkeypatch):
+    (tmp_path / 'ns' / 'sub').mkdir(parents=True)
+    (tmp_path / 'ns' / 'sub' / 'mod.py').write_text('x = 1\n')
+    (tmp_path / 'main.py').write_text('import ns.sub.mod\n')
+    monkeypatch.setattr(sys, 'path', [str(tmp_path), *sys.path])
+    yaid.find_spec.cache_clear()
+    yaid._file_finder.cache_clear()
+
+    passed = yaid.YetAnotherImportDetector(tmp_path / 'main.py').detect()
+
+    assert {str(path) for path in passed} == {str(tmp_path / 'main.py'), str(tmp_path / 'ns' / 'sub' / 'mod.py')}
+    assert yaid.find_source('ns.sub') == '$ns.sub'
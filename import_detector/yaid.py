@@ -9,10 +9,18 @@ two.py depends on os
 Let imagine it in @graphql
 """
 
+import argparse
 import ast
 import collections
+import concurrent.futures
+import functools
+import hashlib
+import importlib.machinery
+import json
 import logging
 import os
+import sqlite3
+import sys
 import typing
 import inspect
 import rich.logging
@@ -28,12 +36,26 @@ class Const:
 
 
 class YetAnotherImportDetector:
-    def __init__(self, path_to_mod):
+    def __init__(
+            self, path_to_mod, workers=0, resolver: typing.Literal['static', 'exec'] = 'static',
+            cache: 'ScanCache' = None,
+    ):
+        """ :workers: > 0 parses every frontier level in that many processes,
+        the result is the same as of the serial scan.
+        :resolver: 'exec' imports every module to find its source, 'static' only looks it up.
+        :cache: keeps dependencies of unchanged files between scans
+        """
         self._root = pathlib.Path(path_to_mod).resolve()
         self._deque = collections.deque()
         self._passed = set()
+        self._workers = workers
+        self._resolver = resolver
+        self._cache = cache
+        self._fetch_dependencies = functools.partial(fetch_dependencies, resolve=RESOLVERS[resolver])
 
     def detect(self):
+        if self._workers:
+            return self._detect_by_levels()
         self._deque.append(self._root)
 
         while len(self._deque):
@@ -44,20 +66,153 @@ class YetAnotherImportDetector:
             self._passed.add(path)
             if isinstance(path, str) and path.startswith('$'):  # builtin, pyx, ...
                 continue
-            if (mod := fetch_ast(path)) is None:
-                continue
-            for elem in fetch_imports(mod):
-                if isinstance(elem, ast.Import) or elem.level == 0:
-                    # import a, b, c.d.e
-                    self._deque.extend(resolve_direct_source(elem))
-                else:
-                    # from a import b, c, d
-                    # from . import a, b
-                    # from ..... import a, b
-                    # from ...a.b.c import d, e
-                    self._deque.extend(resolve_related_source(path, elem))
+            self._deque.extend(self._dependencies([path], map)[0])
+        if self._cache is not None:
+            self._cache.commit()
+        return self._passed
+
+    def _detect_by_levels(self):
+        frontier = [self._root]
+        with concurrent.futures.ProcessPoolExecutor(self._workers) as pool:
+            while frontier:
+                level = []
+                for path in frontier:
+                    if path in self._passed:
+                        continue
+                    self._passed.add(path)
+                    if not (isinstance(path, str) and path.startswith('$')):
+                        level.append(path)
+                chunk_size = max(1, len(level) // (self._workers * 4))
+                frontier = [
+                    dependency
+                    for dependencies in self._dependencies(
+                        level, lambda func, paths: pool.map(func, paths, chunksize=chunk_size))
+                    for dependency in dependencies
+                ]
+                if self._cache is not None:
+                    self._cache.commit()
         return self._passed
 
+    def _dependencies(self, paths, map_) -> typing.List[list]:
+        """ Dependencies of every path, only the ones missing in the cache are parsed by :map_: """
+        found = {}
+        if self._cache is not None:
+            for path in paths:
+                if (dependencies := self._cache.get(path, self._resolver)) is not None:
+                    found[path] = dependencies
+        missed = [path for path in paths if path not in found]
+        for path, dependencies in zip(missed, map_(self._fetch_dependencies, missed)):
+            found[path] = dependencies
+            if self._cache is not None:
+                self._cache.put(path, self._resolver, dependencies)
+        return [found[path] for path in paths]
+
+
+class ScanCache:
+    """ Dependencies of scanned files, an entry is used while the mtime and size
+    of its file stay the same. Edges of unchanged files are not re-resolved,
+    so a module installed since the last scan needs invalidate().
+    Entries are kept apart per interpreter and sys.path, see :environment:
+    """
+    version = 1
+
+    def __init__(self, path):
+        self.path = pathlib.Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.hits = self.misses = 0
+        # another venv resolves the same imports to other files
+        self.environment = hashlib.sha1(json.dumps([sys.executable, sys.path]).encode()).hexdigest()
+        self._conn = sqlite3.connect(self.path)
+        if self._conn.execute('pragma user_version').fetchone()[0] != self.version:
+            self._conn.execute('drop table if exists scanned')
+            self._conn.execute(f'pragma user_version = {self.version}')
+        self._conn.executescript('''
+            create table if not exists scanned (
+                path text not null,
+                resolver text not null,
+                environment char(40) not null,
+                mtime_ns integer not null,
+                size integer not null,
+                dependencies text not null,
+                primary key (path, resolver, environment)
+            );
+        ''')
+
+    @staticmethod
+    def _stamp(path):
+        stat = os.stat(path)
+        return stat.st_mtime_ns, stat.st_size
+
+    def get(self, path, resolver) -> typing.Optional[list]:
+        try:
+            stamp = self._stamp(path)
+        except (OSError, TypeError, ValueError):
+            return None
+        row = self._conn.execute(
+            'select mtime_ns, size, dependencies from scanned where path = ? and resolver = ? and environment = ?',
+            (str(path), resolver, self.environment),
+        ).fetchone()
+        if row is None or tuple(row[:2]) != stamp:
+            self.misses += 1
+            return None
+        self.hits += 1
+        # related sources are pathlib.Path, direct ones are str, the scan tells them apart
+        return [pathlib.Path(value) if is_path else value for is_path, value in json.loads(row[2])]
+
+    def put(self, path, resolver, dependencies):
+        try:
+            stamp = self._stamp(path)
+        except (OSError, TypeError, ValueError):
+            return
+        self._conn.execute(
+            'insert or replace into scanned values (?, ?, ?, ?, ?, ?)',
+            (str(path), resolver, self.environment, *stamp, json.dumps([
+                [isinstance(dependency, pathlib.Path), str(dependency)] for dependency in dependencies
+            ])),
+        )
+
+    def commit(self):
+        self._conn.commit()
+
+    def entries(self):
+        """ (path, resolver, dependency count, whether the file is unchanged) of this environment """
+        for path, resolver, mtime_ns, size, dependencies in self._conn.execute(
+                'select path, resolver, mtime_ns, size, dependencies from scanned '
+                'where environment = ? order by path, resolver', (self.environment,)):
+            try:
+                fresh = self._stamp(path) == (mtime_ns, size)
+            except OSError:
+                fresh = False
+            yield path, resolver, len(json.loads(dependencies)), fresh
+
+    def invalidate(self, paths=None) -> int:
+        """ Forgets :paths: or everything, returns the number of dropped entries """
+        with self._conn:
+            if paths is None:
+                return self._conn.execute('delete from scanned').rowcount
+            return sum(
+                self._conn.execute('delete from scanned where path = ?', (str(path),)).rowcount
+                for path in paths
+            )
+
+
+def fetch_dependencies(path, resolve) -> list:
+    """ Sources imported by :path:, runs in the pool workers too """
+    if (mod := fetch_ast(path)) is None:
+        return []
+    dependencies = []
+    for elem in fetch_imports(mod):
+        if isinstance(elem, ast.Import) or elem.level == 0:
+            # import a, b, c.d.e
+            dependencies.extend(resolve(elem))
+        else:
+            # from a import b, c, d
+            # from . import a, b
+            # from ..... import a, b
+            # from ...a.b.c import d, e
+            dependencies.extend(resolve_related_source(path, elem))
+    return dependencies
+
 
 def fetch_ast(
         path, *,
@@ -114,6 +269,79 @@ def resolve_direct_source(elem: typing.Union[ast.Import, ast.ImportFrom]):
                 yield getattr(mod, '__file__', '$' + mod.__name__)
 
 
+def resolve_static_source(elem: typing.Union[ast.Import, ast.ImportFrom]):
+    """ Like resolve_direct_source, but nothing gets imported:
+    `from a import b` is a/b.py when it exists, otherwise it is a itself
+    """
+    if isinstance(elem, ast.Import):
+        names = [alias.name for alias in elem.names]
+    else:
+        names = [
+            elem.module if alias.name == '*' or find_source(f'{elem.module}.{alias.name}') is None
+            else f'{elem.module}.{alias.name}'
+            for alias in elem.names
+        ]
+    for name in dict.fromkeys(names):
+        found = name
+        # os.path and the like are set up at import time, the nearest package found stands for them
+        while (source := find_source(found)) is None and '.' in found:
+            found, _, _ = found.rpartition('.')
+        if source is None:
+            logging.warning(f'{name} cannot be found')
+        else:
+            yield source
+
+
+def find_source(name) -> typing.Optional[str]:
+    """ File of the module :name:, '$name' for the ones without it """
+    if (spec := find_spec(name)) is None:
+        return None
+    return spec.origin if spec.has_location else '$' + name  # builtins, frozen, namespace packages
+
+
+@functools.lru_cache(maxsize=None)
+def find_spec(name) -> typing.Optional[importlib.machinery.ModuleSpec]:
+    """ Looked up by the finders of the import system, one time per scan and process """
+    parent, _, _ = name.rpartition('.')
+    if parent:
+        if (parent_spec := find_spec(parent)) is None or parent_spec.submodule_search_locations is None:
+            return None
+        return _find_submodule_spec(name, list(parent_spec.submodule_search_locations))
+    for finder in (importlib.machinery.BuiltinImporter, importlib.machinery.PathFinder,
+                   importlib.machinery.FrozenImporter):
+        if (spec := finder.find_spec(name)) is not None:
+            return spec
+    return None
+
+
+def _find_submodule_spec(name, locations) -> typing.Optional[importlib.machinery.ModuleSpec]:
+    """ PathFinder.find_spec(name, locations) without its _NamespacePath,
+    which looks the parent up in sys.modules and fails as nothing is imported here
+    """
+    portions = []
+    for location in locations:
+        if (spec := _file_finder(location).find_spec(name)) is None:
+            continue
+        if spec.loader is not None:
+            return spec
+        portions.extend(spec.submodule_search_locations or ())  # a portion of a namespace package
+    if not portions:
+        return None
+    spec = importlib.machinery.ModuleSpec(name, None, is_package=True)
+    spec.submodule_search_locations = portions
+    return spec
+
+
+@functools.lru_cache(maxsize=None)
+def _file_finder(location) -> importlib.machinery.FileFinder:
+    return importlib.machinery.FileFinder(
+        location,
+        (importlib.machinery.ExtensionFileLoader, importlib.machinery.EXTENSION_SUFFIXES),
+        (importlib.machinery.SourceFileLoader, importlib.machinery.SOURCE_SUFFIXES),
+        (importlib.machinery.SourcelessFileLoader, importlib.machinery.BYTECODE_SUFFIXES),
+    )
+
+
 def resolve_related_source(base_path, elem: ast.ImportFrom):
     work_dir = pathlib.Path(base_path).parent
     for _ in range(1, elem.level):
@@ -128,6 +356,32 @@ def resolve_related_source(base_path, elem: ast.ImportFrom):
         yield (work_dir / fl_name).resolve()
 
 
+RESOLVERS = {'static': resolve_static_source, 'exec': resolve_direct_source}
+
 if __name__ == '__main__':
-    for n in sorted(map(str, YetAnotherImportDetector('../read_flow/flow.py').detect())):
-        print(n)
+    parser = argparse.ArgumentParser()
+    parser.add_argument('path', nargs='?', default='../read_flow/flow.py')
+    parser.add_argument('--workers', type=int, default=0, help='processes parsing every level, 0 scans serially')
+    parser.add_argument('--resolver', choices=RESOLVERS, default='static')
+    parser.add_argument('--cache', default=os.getenv('YAID_CACHE', pathlib.Path.home() / '.cache' / 'yaid.sqlite'))
+    parser.add_argument('--no-cache', action='store_true', help='parse every file again')
+    group = parser.add_mutually_exclusive_group()
+    group.add_argument('--warm', action='store_true', help='scan :path: into the cache, print only the counts')
+    group.add_argument('--inspect', action='store_true', help='print the cached files')
+    group.add_argument('--invalidate', nargs='*', metavar='FILE', help='drop the given files or, without any, all')
+    args = parser.parse_args()
+
+    cache = None if args.no_cache else ScanCache(args.cache)
+    if args.inspect and cache is not None:
+        for path, resolver, count, fresh in cache.entries():
+            print(f'{path}  {resolver}  {count} imports{"" if fresh else "  (stale)"}')
+    elif args.invalidate is not None and cache is not None:
+        paths = [pathlib.Path(path).resolve() for path in args.invalidate] or None
+        print(f'{cache.invalidate(paths)} entries dropped')
+    else:
+        passed = YetAnotherImportDetector(args.path, args.workers, args.resolver, cache).detect()
+        if args.warm:
+            print(f'{len(passed)} modules, {cache and cache.misses} parsed, {cache and cache.hits} from the cache')
+        else:
+            for n in sorted(map(str, passed)):
+                print(n)
@@ -1,2 +1,9 @@
-from .flow import WorkFlow
 from .utils import paste, current_window, read_cmd, encrypt, decrypt
+
+
+def __getattr__(name):
+    # flow pulls in Gtk, keyboard and rich, only the interactive mode needs them
+    if name == 'WorkFlow':
+        from .flow import WorkFlow
+        return WorkFlow
+    raise AttributeError(f'module {__name__!r} has no attribute {name!r}')
@@ -4,15 +4,17 @@ import sys
 import dataclasses
 import pathlib
 
-from .flow import WorkFlow, Cursor, GoogleSheet
+from .sheet import Cursor, GoogleSheet
+from .jobs import WriteJob
 
 
-def save_cursor(cursor: Cursor):
+def save_cursor(cursor: Cursor, pending: list[WriteJob] = ()):
     m, _ = os.path.split(__file__)
     meta = {}
     with open(m + '/meta.json') as meta['file']:
         meta['dict'] = json.load(meta['file'])
     meta['dict']['CURSOR'] = dataclasses.astuple(cursor)
+    meta['dict']['PENDING'] = [[job.word, job.row] for job in pending]
     with open(m + '/meta.json', 'w') as meta['file']:
         json.dump(meta['dict'], meta['file'], indent=4, ensure_ascii=False)
     del meta
@@ -35,18 +37,23 @@ def get_cursor() -> Cursor:
         exit(1)
 
 
+def get_pending() -> list[WriteJob]:
+    """ write jobs interrupted by the last Ctrl-C """
+    with open(pathlib.Path(__file__).parent / 'meta.json') as meta_file:
+        return [WriteJob(word, row) for word, row in json.load(meta_file).get('PENDING', [])]
+
+
 if __name__ == '__main__':
     if len(sys.argv) == 4 and sys.argv[1] == 'sign':
         GoogleSheet.generate_signed_files(sys.argv[2], sys.argv[3])
         exit(0)
-    if len(sys.argv) == 4 and sys.argv[1] == 'learn':
-        f, t = map(int, sys.argv[2:])
-        a = GoogleSheet().get(f'A{f}:A{t}')
-        c = GoogleSheet().get(f'C{f}:C{t}')
-        assert len(a) == len(c)
-        with open('out.txt', 'w') as out:
-            for ai, ci in zip(a, c):
-                if len(ai) and len(ci):
-                    out.write(f'{ai[0]}\t{ci[0]}\n')
+    if len(sys.argv) >= 3 and sys.argv[1] == 'learn':
+        from . import learn
+        learn.main(sys.argv[2:])
+        exit(0)
+    if len(sys.argv) >= 3 and sys.argv[1] == 'ingest':
+        from . import ingest
+        ingest.main(sys.argv[2:], get_cursor())
         exit(0)
-    WorkFlow(get_cursor(), save_cursor).run()
+    from .flow import WorkFlow
+    WorkFlow(get_cursor(), save_cursor, get_pending()).run()
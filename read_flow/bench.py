@@ -0,0 +1,105 @@
+""" End-to-end timings of WorkFlow against read_flow.fake_server:
+    python -m read_flow.bench --sizes 100 1000 5000 --writes 50 --latency 0.05 --error-rate 0.01
+Lookups and the sheet are answered locally, the lookup cache and the mirror live in a temporary directory
+"""
+
+import argparse
+import contextlib
+import os
+import pathlib
+import tempfile
+import time
+
+from . import fake_server
+
+SHEET = 'bench'
+
+
+def seed(size, prefix):
+    """ :size: rows under the header, every other one holds only a word for fill_empty_on_net """
+    rows = [['word', 'phonetic', 'translation']]
+    for i in range(size):
+        word = f'{prefix}{i}'
+        rows.append([word] if i % 2 else [word, f'[{fake_server.phonetic(word)}]', fake_server.translation(word)])
+    return rows
+
+
+def timed(result: dict, name, func, *args):
+    started_at = time.perf_counter()
+    try:
+        func(*args)
+    except Exception as e:
+        result[name] = repr(e)
+    else:
+        result[name] = time.perf_counter() - started_at
+
+
+def measure(server: fake_server.FakeServer, size, writes, tmp: pathlib.Path, timeout) -> dict:
+    from .flow import Output, WorkFlow
+    from .mirror import SheetMirror
+    from .sheet import Cursor
+
+    # fresh words for every size, so nothing comes from the lookup cache
+    server.sheets.sheets[SHEET] = seed(size, f's{size}w')
+    SheetMirror.path = tmp / f'mirror-{size}.json'
+    Output.states.clear()
+    result = {}
+
+    flow = None
+
+    def start():
+        nonlocal flow
+        flow = WorkFlow(Cursor(SHEET, 'A', size + 2), lambda *_: None)
+
+    def write_result():
+        for i in range(writes):
+            flow.write_result(f's{size}n{i}')
+        deadline = time.monotonic() + timeout
+        while any(state == 'pending' for state in Output.states.values()):
+            if time.monotonic() > deadline:
+                raise TimeoutError(f'{writes} writes')
+            time.sleep(0.01)
+        flow.g_sheet.flush()
+
+    timed(result, 'start', start)
+    if flow is None:
+        return result
+    timed(result, 'fill_empty_on_net', flow.fill_empty_on_net)
+    # rows whose lookups failed, see the errors of informator.* below
+    result['left empty'] = sum(len(row) == 1 for row in server.sheets.get(f'{SHEET}!A:C')[1:])
+    timed(result, f'write_result x{writes}', write_result)
+    timed(result, 'reload_from_net', flow.reload_from_net, True)
+    result['failed writes'] = sum(state == 'failed' for state in Output.states.values())
+    return result
+
+
+def main(sizes, writes, latency, jitter, error_rate, timeout):
+    server = fake_server.FakeServer(latency=latency, jitter=jitter, error_rate=error_rate).start()
+    with tempfile.TemporaryDirectory() as tmp:
+        os.environ.update(server.env())
+        os.environ['RF_CACHE_PATH'] = os.path.join(tmp, 'cache.sqlite')
+        os.environ.setdefault('RF_DEFAULT_HOST_RATE', '0')  # the stand-in needs no politeness
+
+        from . import stats
+        for size in sizes:
+            stats.reset()
+            server.hits.clear()
+            with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+                result = measure(server, size, writes, pathlib.Path(tmp), timeout)
+            print(f'{size} rows:', '  '.join(
+                f'{k}: {v:.2f}s' if isinstance(v, float) else f'{k}: {v}' for k, v in result.items()
+            ))
+            print('    requests:', dict(server.hits))
+            print(stats.report().replace('\r\n', '\n'))
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(prog='python -m read_flow.bench')
+    parser.add_argument('--sizes', type=int, nargs='+', default=[100, 1000, 5000])
+    parser.add_argument('--writes', type=int, default=50, help='words sent through write_result')
+    parser.add_argument('--latency', type=float, default=0.05, help='seconds before every response')
+    parser.add_argument('--jitter', type=float, default=0.02)
+    parser.add_argument('--error-rate', type=float, default=0.0, help='share of 500 responses')
+    parser.add_argument('--timeout', type=float, default=120, help='seconds to wait for the writes')
+    args = parser.parse_args()
+    main(args.sizes, args.writes, args.latency, args.jitter, args.error_rate, args.timeout)
@@ -0,0 +1,76 @@
+import os
+import pathlib
+import sqlite3
+import threading
+import time
+
+
+class LookupCache:
+    """ Phonetics and translations already fetched, stored next to meta.json.
+    Keeps at most :max_entries: (least recently used go first)
+    and forgets entries older than :ttl: seconds
+    """
+    __instance: 'LookupCache' = None
+
+    def __init__(self, path, max_entries, ttl):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.executescript('''
+            create table if not exists lookup (
+                kind text not null,
+                word text not null,
+                langs text not null,
+                value text not null,
+                created_at real not null,
+                used_at real not null,
+                primary key (kind, word, langs)
+            );
+            create index if not exists lookup_used_at on lookup (used_at);
+        ''')
+
+    @classmethod
+    def shared(cls) -> 'LookupCache':
+        if cls.__instance is None:
+            cls.__instance = cls(
+                os.getenv('RF_CACHE_PATH', pathlib.Path(__file__).parent / 'cache.sqlite'),
+                max_entries=int(os.getenv('RF_CACHE_SIZE', 100_000)),
+                ttl=float(os.getenv('RF_CACHE_TTL_DAYS', 180)) * 24 * 3600,
+            )
+        return cls.__instance
+
+    def get(self, kind, word, langs):
+        now = time.time()
+        with self._lock, self._conn:
+            row = self._conn.execute(
+                'select value, created_at from lookup where kind = ? and word = ? and langs = ?',
+                (kind, word, langs),
+            ).fetchone()
+            if row is None:
+                return None
+            if row[1] < now - self.ttl:
+                self._conn.execute(
+                    'delete from lookup where kind = ? and word = ? and langs = ?',
+                    (kind, word, langs),
+                )
+                return None
+            self._conn.execute(
+                'update lookup set used_at = ? where kind = ? and word = ? and langs = ?',
+                (now, kind, word, langs),
+            )
+            return row[0]
+
+    def put(self, kind, word, langs, value):
+        now = time.time()
+        with self._lock, self._conn:
+            self._conn.execute(
+                'insert or replace into lookup values (?, ?, ?, ?, ?, ?)',
+                (kind, word, langs, value, now, now),
+            )
+            self._conn.execute('''
+                delete from lookup where rowid in (
+                    select rowid from lookup order by used_at
+                    limit max(0, (select count(*) from lookup) - ?)
+                )
+            ''', (self.max_entries,))
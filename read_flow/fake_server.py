@@ -0,0 +1,227 @@
+""" Local stand-in for tophonetics, the batchexecute translation and the Sheets values API:
+    python -m read_flow.fake_server --port 8765 --latency 0.05 --error-rate 0.01
+then point read_flow at it with the printed RF_PHONETIC_URL, RF_TRANSLATE_URL and RF_SHEETS_ENDPOINT
+"""
+
+import argparse
+import collections
+import http.server
+import json
+import random
+import re
+import threading
+import time
+import urllib.parse
+
+range_reg = re.compile(r'(?:(.+)!)?([A-Z]+)(\d*)(?::([A-Z]+)(\d*))?$')
+
+VALUES = 'v4/spreadsheets/{spreadsheetId}/values'
+
+
+def _method(name, path, http_method, path_params=(), query_params=(), request=None, response='ValueRange'):
+    parameters = {
+        **{p: {'type': 'string', 'location': 'path', 'required': True} for p in ('spreadsheetId', *path_params)},
+        **{p: {'type': 'string', 'location': 'query', 'repeated': p == 'ranges'} for p in query_params},
+    }
+    return {
+        'id': f'sheets.spreadsheets.values.{name}',
+        'path': path,
+        'httpMethod': http_method,
+        'parameters': parameters,
+        'parameterOrder': ['spreadsheetId', *path_params],
+        **({'request': {'$ref': request}} if request else {}),
+        'response': {'$ref': response},  # without it the client returns raw bytes
+    }
+
+
+def discovery(root_url):
+    """ The part of the Sheets v4 discovery document GoogleSheet uses """
+    object_schema = {'type': 'object', 'properties': {}}
+    return {
+        'kind': 'discovery#restDescription',
+        'name': 'sheets',
+        'version': 'v4',
+        'rootUrl': root_url,
+        'servicePath': '',
+        'batchPath': 'batch',
+        'parameters': {},
+        'schemas': {name: {'id': name, **object_schema} for name in (
+            'ValueRange', 'BatchUpdateValuesRequest', 'BatchGetValuesResponse', 'BatchUpdateValuesResponse',
+            'UpdateValuesResponse',
+        )},
+        'resources': {'spreadsheets': {'resources': {'values': {'methods': {
+            'get': _method('get', VALUES + '/{range}', 'GET', ['range'], ['majorDimension']),
+            'update': _method(
+                'update', VALUES + '/{range}', 'PUT', ['range'], ['valueInputOption'],
+                'ValueRange', 'UpdateValuesResponse',
+            ),
+            'batchGet': _method(
+                'batchGet', VALUES + ':batchGet', 'GET', [], ['ranges', 'majorDimension'],
+                response='BatchGetValuesResponse',
+            ),
+            'batchUpdate': _method(
+                'batchUpdate', VALUES + ':batchUpdate', 'POST', [], [],
+                'BatchUpdateValuesRequest', 'BatchUpdateValuesResponse',
+            ),
+        }}}}},
+    }
+
+
+def _column(letters):
+    n = 0
+    for letter in letters:
+        n = n * 26 + ord(letter) - ord('A') + 1
+    return n - 1
+
+
+class Sheets:
+    """ Sheet name -> rows of cells starting at A1, trimmed the way the API trims them """
+
+    def __init__(self, sheets: dict[str, list[list[str]]] = None):
+        self.sheets = sheets or {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _bounds(a1):
+        name, c1, r1, c2, r2 = range_reg.match(a1).groups()
+        first_row = int(r1) - 1 if r1 else 0
+        last_row = int(r2) if r2 else (first_row + 1 if r1 and c2 is None else None)
+        return name, first_row, last_row, _column(c1), _column(c2 or c1) + 1
+
+    def get(self, a1):
+        name, first_row, last_row, first_col, last_col = self._bounds(a1)
+        with self._lock:
+            rows = [list(row[first_col:last_col]) for row in self.sheets.get(name, [])[first_row:last_row]]
+        for row in rows:
+            while row and row[-1] == '':
+                row.pop()
+        while rows and not rows[-1]:
+            rows.pop()
+        return rows
+
+    def update(self, a1, values):
+        name, first_row, _, first_col, _ = self._bounds(a1)
+        with self._lock:
+            sheet = self.sheets.setdefault(name, [])
+            for i, values_row in enumerate(values, start=first_row):
+                sheet.extend([] for _ in range(i + 1 - len(sheet)))
+                row = sheet[i]
+                row.extend('' for _ in range(first_col + len(values_row) - len(row)))
+                row[first_col:first_col + len(values_row)] = map(str, values_row)
+
+
+class FakeServer(http.server.ThreadingHTTPServer):
+    """ Every response waits :latency: plus up to :jitter: seconds,
+    :error_rate: of them are answered with 500 instead
+    """
+    daemon_threads = True
+
+    def __init__(self, address=('127.0.0.1', 0), latency=0.0, jitter=0.0, error_rate=0.0, sheets: Sheets = None):
+        super().__init__(address, Handler)
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.sheets = sheets or Sheets()
+        self.hits = collections.Counter()  # requests by the first path segment
+        self.lock = threading.Lock()
+
+    @property
+    def url(self):
+        return 'http://{}:{}'.format(*self.server_address[:2])
+
+    def env(self) -> dict:
+        return {
+            'RF_PHONETIC_URL': self.url + '/phonetic',
+            'RF_TRANSLATE_URL': self.url + '/translate/batchexecute',
+            'RF_SHEETS_ENDPOINT': self.url,
+        }
+
+    def start(self):
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+        return self
+
+
+def phonetic(word):
+    return 'ˈ' + word
+
+
+def translation(word):
+    return word[::-1]
+
+
+class Handler(http.server.BaseHTTPRequestHandler):
+    server: FakeServer
+    protocol_version = 'HTTP/1.1'
+    disable_nagle_algorithm = True  # headers and body go out in separate writes
+
+    def log_message(self, *args):
+        pass
+
+    def do_GET(self):
+        self._handle('GET')
+
+    def do_POST(self):
+        self._handle('POST')
+
+    def do_PUT(self):
+        self._handle('PUT')
+
+    def _handle(self, method):
+        url = urllib.parse.urlsplit(self.path)
+        route = method + ' ' + re.sub(r'^/v4/spreadsheets/[^/:]+/values', '/values', url.path)
+        with self.server.lock:
+            self.server.hits[route.split('/')[1]] += 1
+        body = self.rfile.read(int(self.headers.get('Content-Length', 0))).decode()
+        query = urllib.parse.parse_qs(url.query)
+        time.sleep(self.server.latency + random.uniform(0, self.server.jitter))
+
+        if route.startswith('GET /$discovery/'):
+            return self._reply(200, discovery(self.server.url + '/'))
+        if random.random() < self.server.error_rate:
+            return self._reply(500, {'error': {'code': 500, 'message': 'injected'}})
+
+        sheets = self.server.sheets
+        if route == 'POST /phonetic':
+            word = urllib.parse.parse_qs(body)['text_to_transcribe'][0]
+            return self._reply(200, f'<span class="transcribed_word">{phonetic(word)}</span>', 'text/html')
+        if route == 'POST /translate/batchexecute':
+            word = json.loads(json.loads(urllib.parse.parse_qs(body)['f.req'][0])[0][0][1])[0]
+            payload = [['wrb.fr', 'AVdN8', json.dumps([[[None, translation(word)]]])]]
+            return self._reply(200, ")]}'\n" + json.dumps(payload), 'application/json')
+        if route == 'GET /values:batchGet':
+            return self._reply(200, {'valueRanges': [
+                {'range': a1, 'values': sheets.get(a1)} for a1 in query.get('ranges', [])
+            ]})
+        if route == 'POST /values:batchUpdate':
+            for data in json.loads(body)['data']:
+                sheets.update(data['range'], data['values'])
+            return self._reply(200, {'totalUpdatedRows': len(json.loads(body)['data'])})
+        if route.startswith('GET /values/'):
+            a1 = urllib.parse.unquote(route[len('GET /values/'):])
+            return self._reply(200, {'range': a1, 'values': sheets.get(a1)})
+        if route.startswith('PUT /values/'):
+            a1 = urllib.parse.unquote(route[len('PUT /values/'):])
+            sheets.update(a1, json.loads(body)['values'])
+            return self._reply(200, {'updatedRange': a1})
+        self._reply(404, {'error': {'code': 404, 'message': route}})
+
+    def _reply(self, status, payload, content_type='application/json'):
+        content = (payload if isinstance(payload, str) else json.dumps(payload)).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', content_type + '; charset=utf-8')
+        self.send_header('Content-Length', str(len(content)))
+        self.end_headers()
+        self.wfile.write(content)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(prog='python -m read_flow.fake_server')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--latency', type=float, default=0.0, help='seconds before every response')
+    parser.add_argument('--jitter', type=float, default=0.0, help='up to that many seconds more')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='share of 500 responses')
+    args = parser.parse_args()
+    server = FakeServer(('127.0.0.1', args.port), args.latency, args.jitter, args.error_rate)
+    for name, value in server.env().items():
+        print(f'export {name}={value}')
+    server.serve_forever()
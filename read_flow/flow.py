@@ -1,22 +1,24 @@
-from google_auth_oauthlib.flow import InstalledAppFlow
-from googleapiclient.discovery import build
 from typing import Callable, Literal
 import click
-import dataclasses
+import concurrent.futures
 import gi
-import google.oauth2.credentials
-import pathlib
 import json
 import keyboard
 import os
 import re
-import requests
 import rich.console
 import rich.segment
 import rich.table
 import threading
 
+from . import stats
 from . import utils
+from .informator import Informator
+from .jobs import JobQueue, WriteJob
+from .mirror import SheetMirror
+from .prefetch import Prefetcher
+from .sheet import Cursor, GoogleSheet
+from .view import TableView
 
 rich.table.Segment = type('Segment', (rich.segment.Segment,), {})
 rich.table.Segment.line = classmethod(lambda cls: cls('\n\r'))
@@ -25,26 +27,9 @@ gi.require_version('Gtk', '3.0')
 from gi.repository import Gtk, Gdk  # NoQA
 
 
-@dataclasses.dataclass
-class Cursor:
-    sheet_name: str
-    column: str
-    row: int
-
-    def where(self, op: Literal['get', 'update']):
-        c = chr(ord(self.column) + 2)
-        pattern = '{0}!{1}{2}:{3}{2}'
-        if op == 'get':
-            pattern = pattern.replace('{2}', '')
-        return pattern.format(*dataclasses.astuple(self), c)
-
-    def where_row(self, row_id):
-        c = chr(ord(self.column) + 2)
-        pattern = '{0}!{1}{4}:{3}{4}'
-        return pattern.format(*dataclasses.astuple(self), c, row_id)
-
-
 class WorkFlow:
+    concurrency = int(os.getenv('RF_CONCURRENCY', 8))
+
     def goto(self, op: Literal['up', 'down']):
         self.cursor.row += 1 if (op == 'down') else -1
         Output().update()
@@ -52,58 +37,104 @@ class WorkFlow:
     def turn(self, op: Literal['on', 'off']):
         self.state['disable'] = (op == 'off')
 
-    @staticmethod
-    def translate_only(word=None):
+    def translate_only(self, word=None):
         word = word or utils.paste()
-        translation = Informator(word).translation().get_one()
+        if (prefetched := self.prefetcher.take(word)) is not None:
+            translation = prefetched[1]
+        else:
+            translation = Informator(word).translation().get_one()
         try:
             Output().fill_props(None, translation)
         except Output.IncorrectUsage:
             Output().print('Attempt to fill props failed')
 
     def write_result(self, word=None):
+        """ Takes the row and returns, lookups and the write are done by self.jobs """
         word = word or utils.paste()
-        phonetic, translation = Informator(word).phonetic().translation().get_all()
-        self.g_sheet.update(self.cursor.where('update'), (word, phonetic, translation))
-        self.cursor.row += 1
-        try:
-            Output().fill_props(phonetic, translation)
-        except Output.IncorrectUsage:
-            Output().print('Attempt to fill props failed')
+        job = WriteJob(word, int(self.cursor.row))
+        self.cursor.row = job.row + 1
+        self.jobs.submit(job)
+
+    def _write_job(self, job: WriteJob):
+        phonetic, translation = self.prefetcher.take(job.word) or Informator.lookup(job.word)
+        written = self.g_sheet.update(self.cursor.where_row(job.row), (job.word, phonetic, translation))
+        # the job is done only once its own range is in the sheet, it may have gone out
+        # (or been rejected) in another worker's batch; a failed write is retried by self.jobs
+        self.g_sheet.flush()
+        written.result(timeout=0)
+        self.mirror.set_row(job.row, (job.word, phonetic, translation))
+        Output().put_row(job.row, [job.word, phonetic, translation])
+
+    @staticmethod
+    def _job_state(job: WriteJob, state):
+        if state == 'failed':
+            Output().log_file.write(f'writing {job.word} to row {job.row} failed: {job.error}\n')
+        Output().set_state(job.row, state)
 
     def __init__(
-            self, cursor: Cursor, save_data: Callable[[Cursor], None]
+            self, cursor: Cursor, save_data: Callable[[Cursor, list[WriteJob]], None],
+            pending: list[WriteJob] = (),
     ):
-        self.g_sheet = GoogleSheet()
+        self.g_sheet = GoogleSheet.shared()
         self.cursor = cursor
+        self.mirror = SheetMirror(self.g_sheet, cursor)
         self.save_data = save_data
         self.disable = True
         self.state = {'disable': False}
         self.window = None
+        self.prefetcher = Prefetcher(Informator.lookup)
+        self.jobs = JobQueue(self._write_job, self._job_state, workers=int(os.getenv('RF_WRITE_WORKERS', 2)))
         self.reload_from_net()
+        for job in pending:
+            self.jobs.submit(job)
 
     def fill_empty_on_net(self):
         print('fill empty cmd...')
-        data: list[list[str]] = self.g_sheet.get(self.cursor.where('get'))
+        # rows are written back whole, so all of them are refetched, the tail window is only for display
+        data: list[list[str]] = self.mirror.sync(full=True)
         Output().log_file.write(json.dumps(data, indent=4, ensure_ascii=False))
 
+        with concurrent.futures.ThreadPoolExecutor(self.concurrency) as pool:
+            lookups = {
+                row_id: pool.submit(Informator.lookup, row[0])
+                for row_id, row in enumerate(data[1:], start=2)
+                if len(row) == 1 and not row[0].lower().startswith('set#')
+            }
+            try:
+                self._apply_filled(data, lookups)
+            finally:
+                self.mirror.save()
+
+        self.g_sheet.flush()
+        self.show()
+
+    def _apply_filled(self, data, lookups):
+        """ goes in sheet order, waiting for the lookup of a row when needed """
         for row_id, row in enumerate(data[1:], start=2):
             if len(row) == 1 and row[0].lower().startswith('set#'):
                 continue
             if len(row) == 1:
-                row.extend(Informator(row[0]).phonetic().translation().get_all())
+                try:
+                    row.extend(lookups[row_id].result())
+                except Exception as e:
+                    # stays empty for the next fill_empty
+                    Output().log_file.write(f'looking up {row[0]} failed: {e!r}\n')
+                    continue
                 Output().log_file.write(f'updating {row[0]}\n')
             elif len(row) and not (row[1].startswith('[') and row[1].endswith(']')):
                 row[1] = f'[{row[1]}]'
             else:
                 continue
             self.g_sheet.update(self.cursor.where_row(row_id), row)
+            self.mirror.set_row(row_id, row, save=False)
 
-        self.reload_from_net()
-
-    def reload_from_net(self):
+    def reload_from_net(self, full=False):
         Output().print(os.popen('clear').read(), 'reloading...', sep='')
-        Output().set_params(self.g_sheet.get(self.cursor.where('get')), self.cursor)
+        self.mirror.sync(full)
+        self.show()
+
+    def show(self):
+        Output().set_params(self.mirror.snapshot(), self.cursor)
         Output().update()
 
     def set_workspace(self):
@@ -113,6 +144,8 @@ class WorkFlow:
         print('[+] Done')
 
     def run(self):
+        if stats_file := os.getenv('RF_STATS_FILE'):
+            stats.export_periodically(stats_file, float(os.getenv('RF_STATS_INTERVAL', 60)))
         try:
             WriteOnCopy(self).start()
             WriteOnHook({
@@ -123,113 +156,16 @@ class WorkFlow:
                 'start': lambda: self.turn('on'),
                 'stop': lambda: self.turn('off'),
                 'fill_empty': self.fill_empty_on_net,
-                'reload': self.reload_from_net,
+                'reload': lambda: self.reload_from_net(full=True),
                 'last_one': lambda: Output().print(Output().data[-1][0]),
                 'set_workspace': self.set_workspace,
+                'stats': lambda: Output().print(stats.report()),
             }, self)
         except KeyboardInterrupt:
-            self.save_data(self.cursor)
-
-
-class GoogleSheet:
-    SCOPES = ['https://www.googleapis.com/auth/spreadsheets']
-
-    def __init__(self):
-        c1, c2, self.sheet_id = self._decrypting()
-        self.flow = InstalledAppFlow.from_client_config(c1, self.SCOPES)
-        self.creds = google.oauth2.credentials.Credentials.from_authorized_user_info(c2)
-        self.service = build('sheets', 'v4', credentials=self.creds)
-        self.sheet = self.service.spreadsheets()
-
-    def get(self, requested_range):
-        return self.sheet.values().get(
-            spreadsheetId=self.sheet_id,
-            range=requested_range,
-        ).execute()['values']
-
-    def update(self, requested_range, body):
-        result = (self.sheet.values()
-                  .update(spreadsheetId=self.sheet_id,
-                          range=requested_range,
-                          valueInputOption='RAW',
-                          body={'values': [body]})
-                  ).execute()
-        return result
-
-    @classmethod
-    def generate_signed_files(cls, path_to_cred, sheet_id):
-        """
-        To get :path_to_cred, please, visit
-        https://developers.google.com/sheets/api/quickstart/python#step_1_turn_on_the
-        """
-        tokens = []
-        with open(path_to_cred) as c1:
-            tokens.append(json.load(c1))
-        flow = InstalledAppFlow.from_client_secrets_file(path_to_cred, cls.SCOPES)
-        tokens.append(json.loads(flow.run_console().to_json()))
-        sign = utils.encrypt(json.dumps({'tokens': tokens, 'sheet_id': sheet_id}), os.getenv('RF_TOKEN'))
-        with open('signed.pwd', 'w') as signed:
-            i = 0
-            while i <= len(sign):
-                signed.write(sign[i:i+80] + '\n')
-                i += 80
-
-    @staticmethod
-    def _decrypting():
-        with open(pathlib.Path(__file__).parent / 'signed.pwd') as signed:
-            sign = signed.read().replace('\n', '')
-        payload = json.loads(utils.decrypt(sign, os.getenv('RF_TOKEN')))
-        return payload['tokens'] + [payload['sheet_id']]
-
-
-class Informator:
-    phonetic_reg = re.compile(r'class="transcribed_word">([^<]*)<')
-
-    def __init__(self, word):
-        self.word = word
-        self._result = []
-        self.get_all = lambda: self._result
-        self.get_one = lambda: self._result[0]
-
-        def one_of():
-            while True:
-                yield 'AD08yZk6u03cH9XOAAypvLB1B4E1:1610259694701'
-                yield 'AD08yZmn7yo658P9CS6zsu-tr1TY:1610263779581'
-                yield 'AD08yZlnhatitexdkhTBB6myW-F1:1610263957709'
-        self._get_token = one_of()
-
-    def phonetic(self):
-        req = requests.post('https://tophonetics.com/', data={'text_to_transcribe': self.word})
-        phonetics = self.phonetic_reg.findall(req.content.decode())
-        self._result.append('[' + ' '.join(phonetics or ['']) + ']')
-        return self
-
-    @property
-    def _token(self):
-        return next(self._get_token)
-
-    def translation(self):
-        option = [self.word, "en", "ru"]
-        option = json.dumps(option, separators=(',', ':'), allow_nan=False,)
-
-        url = 'https://translate.google.ru/_/TranslateWebserverUi/data/batchexecute'
-        data = '&'.join(map('='.join, {
-            'f.req': json.dumps(
-                [[['AVdN8', option, None, 'generic']]],
-                separators=(',', ':'), allow_nan=False,
-            ),
-            'at': self._token,
-        }.items()))
-        r = requests.post(url, data=data, headers={'Content-Type': 'application/x-www-form-urlencoded'})
-        try:
-            result = json.loads(json.loads(r.text[5:])[0][2])[0][0][1]
-        except IndexError as e:
-            Output.log_file.write(' '.join(map(str, [
-                '\nIndexError:', e, '\nstatus:', r.status_code, '\ntext:', json.loads(r.text[5:]), '\n',
-            ])))
-            result = None
-        self._result.append(result)
-        return self
+            try:
+                self.g_sheet.flush()
+            finally:
+                self.save_data(self.cursor, self.jobs.pending())
 
 
 def listen(key_to_act, parent: 'WorkFlow'):
@@ -238,7 +174,7 @@ def listen(key_to_act, parent: 'WorkFlow'):
     def complex_cmd():
         nonlocal cmd
         if match := set_at_cmd_reg.match(cmd):
-            parent.cursor.row = match.group(1)
+            parent.cursor.row = int(match.group(1))
             Output().update()
         else:
             Output().print(f'`{cmd}` is not a command\r\nAvailable commands: ' + ', '.join(key_to_act) + '\r\n')
@@ -268,7 +204,9 @@ class WriteOnCopy(threading.Thread):
     def callback(self, *_):
         if self.parent.state['disable']:
             return
-        Output().new_word(utils.paste())
+        word = utils.paste()
+        Output().new_word(word)
+        self.parent.prefetcher.start(word)
 
 
 class WriteOnHook:
@@ -290,10 +228,13 @@ class WriteOnHook:
 
 class Output:
     IncorrectUsage = type('IncorrectUsage', (Exception,), {})
-    print = print
+    STATE_STYLES = {'pending': 'yellow', 'failed': 'red', 'done': None}
     __instance: 'Output' = None
-    data, console, cursor = None, None, None
+    data, console, cursor, view = None, None, None, None
+    states: dict[int, str] = {}  # data index -> state of its write job
     log_file = open('log.txt', 'w')
+    # hooks, the clipboard thread and write jobs all update the screen
+    lock = threading.RLock()
 
     def __new__(cls, *args, **kwargs):
         if Output.__instance is None:
@@ -301,37 +242,70 @@ class Output:
         return Output.__instance
 
     def set_params(self, data: list[list[str]], cursor: Cursor):
+        with self.lock:
+            self._set_params(data, cursor)
+
+    def _set_params(self, data, cursor):
         self.data = data
         self.console = rich.console.Console()
+        self.view = TableView(self.console)
         self.cursor = cursor
 
+    def print(self, *args, **kwargs):
+        if self.view is not None:
+            self.view.invalidate()
+        print(*args, **kwargs)
+
     def new_word(self, word):
-        if len(self.data[-1]) == 1:
-            self.data[-1:] = []
-        self.data.append([])
-        self.data[-1].append(word)
-        self.update()
+        with self.lock:
+            if len(self.data[-1]) == 1:
+                self.data[-1:] = []
+            self.data.append([])
+            self.data[-1].append(word)
+            self.update()
 
     def fill_props(self, phonetic, translation):
-        if len(self.data[-1]) != 1:
-            print(self.data[-3:], sep='\r\n', end='\r\n')
-            raise self.IncorrectUsage()
-        self.data[-1].extend((phonetic, translation))
-        self.update()
-
+        with self.lock:
+            if len(self.data[-1]) != 1:
+                print(self.data[-3:], sep='\r\n', end='\r\n')
+                raise self.IncorrectUsage()
+            self.data[-1].extend((phonetic, translation))
+            self.update()
+
+    def put_row(self, sheet_row, values):
+        """ Shows a written row, the copied word waiting at the end moves there """
+        with self.lock:
+            index = sheet_row - 1
+            if self.data[-1] == values[:1] and index != len(self.data) - 1:
+                self.data[-1:] = []
+            self.data.extend([] for _ in range(index + 1 - len(self.data)))
+            self.data[index] = values
+            self.update()
+
+    def set_state(self, sheet_row, state):
+        with self.lock:
+            self.states[sheet_row - 1] = state
+            if state == 'done':
+                del self.states[sheet_row - 1]
+            self.update()
+
+    @stats.timed('output.update')
     def update(self):
-        table = rich.table.Table(show_lines=True)
-        for title in self.data[0]:
-            table.add_column(title, style="dim", overflow='fold', width=12)
-        for row_id in range(1, len(self.data)):
-            style = 'blue bold' if row_id == self.cursor.row else None
-            table.add_row(*self._render_row(row_id), style=style)
-        self.console.clear()
-        self.console.print(table, markup=False)
+        with self.lock:
+            selected = int(self.cursor.row)
+            rows = [
+                (row_id, self._render_row(row_id), self.STATE_STYLES.get(self.states.get(row_id)))
+                for row_id in self.view.window(selected, 1, len(self.data) - 1)
+            ]
+            self.view.paint(self.data[0], rows, selected)
 
     def _render_row(self, row_id):
         if len(row := self.data[row_id]) != 3:
             return row
         if row[1] and row[1].startswith('['):
-            row[1] = '\\' + row[1]
+            return [row[0], '\\' + row[1], row[2]]
         return row
+
+
+Informator.log_file = Output.log_file
+GoogleSheet.log_file = Output.log_file
@@ -0,0 +1,82 @@
+import json
+import os
+import re
+import sys
+
+from . import net
+from . import stats
+from .cache import LookupCache
+
+
+class Informator:
+    phonetic_reg = re.compile(r'class="transcribed_word">([^<]*)<')
+    log_file = sys.stderr  # the interactive mode points it to Output.log_file
+    phonetic_url = os.getenv('RF_PHONETIC_URL', 'https://tophonetics.com/')
+    translation_url = os.getenv(
+        'RF_TRANSLATE_URL', 'https://translate.google.ru/_/TranslateWebserverUi/data/batchexecute',
+    )
+
+    def __init__(self, word):
+        self.word = word
+        self._result = []
+        self.get_all = lambda: self._result
+        self.get_one = lambda: self._result[0]
+
+        def one_of():
+            while True:
+                yield 'AD08yZk6u03cH9XOAAypvLB1B4E1:1610259694701'
+                yield 'AD08yZmn7yo658P9CS6zsu-tr1TY:1610263779581'
+                yield 'AD08yZlnhatitexdkhTBB6myW-F1:1610263957709'
+        self._get_token = one_of()
+
+    @stats.timed('informator.phonetic')
+    def phonetic(self):
+        if (cached := LookupCache.shared().get('phonetic', self.word, 'en')) is not None:
+            self._result.append(cached)
+            return self
+        req = net.post(self.phonetic_url, data={'text_to_transcribe': self.word})
+        req.raise_for_status()  # an error page would be written as an empty transcription
+        phonetics = self.phonetic_reg.findall(req.content.decode())
+        self._result.append('[' + ' '.join(phonetics or ['']) + ']')
+        if phonetics:
+            LookupCache.shared().put('phonetic', self.word, 'en', self._result[-1])
+        return self
+
+    @classmethod
+    def lookup(cls, word) -> tuple:
+        """ (phonetic, translation) """
+        return tuple(cls(word).phonetic().translation().get_all())
+
+    @property
+    def _token(self):
+        return next(self._get_token)
+
+    @stats.timed('informator.translation')
+    def translation(self):
+        if (cached := LookupCache.shared().get('translation', self.word, 'en:ru')) is not None:
+            self._result.append(cached)
+            return self
+        option = [self.word, "en", "ru"]
+        option = json.dumps(option, separators=(',', ':'), allow_nan=False,)
+
+        data = '&'.join(map('='.join, {
+            'f.req': json.dumps(
+                [[['AVdN8', option, None, 'generic']]],
+                separators=(',', ':'), allow_nan=False,
+            ),
+            'at': self._token,
+        }.items()))
+        r = net.post(self.translation_url, data=data, headers={'Content-Type': 'application/x-www-form-urlencoded'})
+        r.raise_for_status()
+        try:
+            result = json.loads(json.loads(r.text[5:])[0][2])[0][0][1]
+        except IndexError as e:
+            self.log_file.write(' '.join(map(str, [
+                '\nIndexError:', e, '\nstatus:', r.status_code, '\ntext:', json.loads(r.text[5:]), '\n',
+            ])))
+            result = None
+            stats.error('informator.translation')
+        if result is not None:
+            LookupCache.shared().put('translation', self.word, 'en:ru', result)
+        self._result.append(result)
+        return self
@@ -0,0 +1,117 @@
+""" Appends new words of a text file or an e-book to the sheet:
+    python -m read_flow ingest book.epub [--limit N] [--concurrency N]
+"""
+
+import argparse
+import collections
+import concurrent.futures
+import html
+import itertools
+import os
+import re
+import sys
+import time
+import zipfile
+
+from . import utils
+from .informator import Informator
+from .mirror import SheetMirror
+from .sheet import Cursor, GoogleSheet
+
+word_reg = re.compile(r"[A-Za-z]+(?:['\-][A-Za-z]+)*")
+tag_reg = re.compile(r'<[^>]+>')
+
+
+def read_chunks(path):
+    """ Lines of a text file, documents of an .epub one by one """
+    if str(path).endswith('.epub'):
+        with zipfile.ZipFile(path) as book:
+            for name in book.namelist():
+                if name.endswith(('.xhtml', '.html', '.htm')):
+                    yield html.unescape(tag_reg.sub(' ', book.read(name).decode('utf-8', 'replace')))
+        return
+    with open(path, encoding='utf-8', errors='replace') as text:
+        yield from text
+
+
+def read_words(path):
+    carry = ''
+    for chunk in read_chunks(path):
+        chunk = carry + chunk
+        if chunk.endswith('\u2010\n'):
+            carry = chunk  # a hyphenated word goes on, see utils.normalize
+            continue
+        carry = ''
+        for word in word_reg.findall(utils.normalize(chunk)):
+            yield word.lower()
+    yield from (word.lower() for word in word_reg.findall(utils.normalize(carry)))
+
+
+class Progress:
+    def __init__(self, every=0.5):
+        self.every = every
+        self.read = 0
+        self.added = 0
+        self.started_at = self.printed_at = time.monotonic()
+
+    def unknown(self, words, known: set):
+        """ Counts every read word, yields the ones not in :known: yet """
+        for word in words:
+            self.read += 1
+            if word not in known:
+                known.add(word)
+                yield word
+
+    def step(self, added=1):
+        self.added += added
+        if (now := time.monotonic()) - self.printed_at >= self.every or not added:
+            self.printed_at = now
+            rate = self.added / max(now - self.started_at, 1e-9)
+            print(f'\r{self.added} added, {self.read} words read, {rate:.1f} words/s', end='', file=sys.stderr)
+
+
+def ingest(path, cursor: Cursor, concurrency=8, limit=None):
+    g_sheet = GoogleSheet.shared()
+    mirror = SheetMirror(g_sheet, cursor)
+    rows = mirror.sync()
+    known = {row[0].lower() for row in rows if row}
+    next_row = len(rows) + 1
+
+    progress = Progress()
+    failed = []
+    new_words = itertools.islice(progress.unknown(read_words(path), known), limit)
+    try:
+        with concurrent.futures.ThreadPoolExecutor(concurrency) as pool:
+            # a few lookups per worker ahead, words are appended in the order they were read
+            in_flight = collections.deque()
+            for word in itertools.chain(new_words, [None]):
+                if word is not None:
+                    in_flight.append((word, pool.submit(Informator.lookup, word)))
+                while in_flight and (word is None or len(in_flight) >= concurrency * 4):
+                    word_, lookup = in_flight.popleft()
+                    try:
+                        values = (word_, *lookup.result())
+                    except Exception as e:
+                        failed.append(f'{word_}: {e!r}')
+                        continue
+                    g_sheet.update(cursor.where_row(next_row), values)
+                    mirror.set_row(next_row, values, save=False)
+                    next_row += 1
+                    progress.step()
+    finally:
+        progress.step(0)
+        print(file=sys.stderr)
+        # buffered rows are written whatever stopped the loop, the mirror is saved only once they are
+        g_sheet.flush()
+    mirror.save()
+    if failed:
+        print(f'{len(failed)} words skipped, their lookups failed:', *failed, sep='\n', file=sys.stderr)
+
+
+def main(argv, cursor: Cursor):
+    parser = argparse.ArgumentParser(prog='python -m read_flow ingest')
+    parser.add_argument('path')
+    parser.add_argument('--limit', type=int, default=None, help='at most that many new words')
+    parser.add_argument('--concurrency', type=int, default=int(os.getenv('RF_CONCURRENCY', 8)))
+    args = parser.parse_args(argv)
+    ingest(args.path, cursor, args.concurrency, args.limit)
@@ -0,0 +1,64 @@
+import dataclasses
+import queue
+import threading
+import time
+from typing import Callable
+
+
+@dataclasses.dataclass
+class WriteJob:
+    word: str
+    row: int
+    error: str = dataclasses.field(default=None, compare=False)
+
+
+class JobQueue:
+    """ Runs :handle: for every submitted job on background threads,
+    retrying with exponential backoff. :on_state: gets 'pending', 'done'
+    or 'failed'; jobs which are not done yet are returned by pending()
+    """
+
+    def __init__(
+            self, handle: Callable[[WriteJob], None],
+            on_state: Callable[[WriteJob, str], None],
+            workers=2, retries=3, backoff=1.0,
+    ):
+        self.handle = handle
+        self.on_state = on_state
+        self.retries = retries
+        self.backoff = backoff
+        self._queue = queue.Queue()
+        self._pending: dict[int, WriteJob] = {}
+        self._lock = threading.Lock()
+        for _ in range(workers):
+            threading.Thread(target=self._work, daemon=True).start()
+
+    def submit(self, job: WriteJob):
+        with self._lock:
+            self._pending[job.row] = job
+        self.on_state(job, 'pending')
+        self._queue.put(job)
+
+    def pending(self) -> list[WriteJob]:
+        with self._lock:
+            return list(self._pending.values())
+
+    def _work(self):
+        while True:
+            job = self._queue.get()
+            for attempt in range(self.retries + 1):
+                try:
+                    self.handle(job)
+                except Exception as e:
+                    job.error = repr(e)
+                    if attempt < self.retries:
+                        time.sleep(self.backoff * 2 ** attempt)
+                    continue
+                with self._lock:
+                    if self._pending.get(job.row) is job:
+                        del self._pending[job.row]
+                self.on_state(job, 'done')
+                break
+            else:
+                # stays in pending(), so the next start retries it
+                self.on_state(job, 'failed')
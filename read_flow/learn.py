@@ -0,0 +1,56 @@
+""" Word/translation pairs of the sheet for flashcards:
+    python -m read_flow learn FROM [TO|end] [--format tsv|csv|jsonl] [--out out.txt]
+"""
+
+import argparse
+import csv
+import itertools
+import json
+
+from .sheet import GoogleSheet
+
+FORMATS = 'tsv', 'csv', 'jsonl'
+
+
+def writer(fmt, out):
+    if fmt == 'csv':
+        # Anki imports "front,back" lines with the usual csv quoting
+        rows = csv.writer(out, lineterminator='\n')
+        return lambda word, translation: rows.writerow((word, translation))
+    if fmt == 'jsonl':
+        return lambda word, translation: out.write(
+            json.dumps({'word': word, 'translation': translation}, ensure_ascii=False) + '\n'
+        )
+    return lambda word, translation: out.write(f'{word}\t{translation}\n')
+
+
+def pairs(g_sheet: GoogleSheet, first, last=None, page_size=500):
+    """ Yields (word, translation) of rows first..last, one batchGet per page.
+    Without :last: it goes on until a page has no words and no translations
+    """
+    for start in itertools.count(first, page_size):
+        end = start + page_size - 1 if last is None else min(start + page_size - 1, last)
+        if end < start:
+            return
+        words, translations = g_sheet.batch_get([f'A{start}:A{end}', f'C{start}:C{end}'])
+        if last is None and not words and not translations:
+            return
+        for w, t in itertools.zip_longest(words, translations, fillvalue=[]):
+            if len(w) and len(t):
+                yield w[0], t[0]
+
+
+def main(argv):
+    parser = argparse.ArgumentParser(prog='python -m read_flow learn')
+    parser.add_argument('first', type=int)
+    parser.add_argument('last', nargs='?', default='end')
+    parser.add_argument('--format', choices=FORMATS, default='tsv')
+    parser.add_argument('--out', default='out.txt')
+    parser.add_argument('--page-size', type=int, default=500)
+    args = parser.parse_args(argv)
+
+    last = None if args.last == 'end' else int(args.last)
+    with open(args.out, 'w', newline='') as out:
+        write = writer(args.format, out)
+        for word, translation in pairs(GoogleSheet.shared(), args.first, last, args.page_size):
+            write(word, translation)
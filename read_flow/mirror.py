@@ -0,0 +1,57 @@
+import json
+import os
+import pathlib
+import threading
+
+
+class SheetMirror:
+    """ Local copy of the cursor's columns, rows[0] is the sheet row 1.
+    sync() refetches only the last :overlap: rows and whatever follows them,
+    rows edited remotely above that are picked up by sync(full=True)
+    """
+    path = pathlib.Path(__file__).parent / 'mirror.json'
+    overlap = int(os.getenv('RF_MIRROR_OVERLAP', 20))
+
+    def __init__(self, g_sheet, cursor):
+        self.g_sheet = g_sheet
+        self.cursor = cursor
+        self.rows: list[list[str]] = []
+        self._lock = threading.Lock()
+        try:
+            with open(self.path) as mirror:
+                saved = json.load(mirror)
+            if saved['range'] == cursor.where('get') and saved['sheet_id'] == g_sheet.sheet_id:
+                self.rows = saved['rows']
+        except (FileNotFoundError, KeyError, json.JSONDecodeError):
+            pass
+
+    def sync(self, full=False) -> list[list[str]]:
+        first = 1 if full else max(1, len(self.rows) - self.overlap + 1)
+        fetched = self.g_sheet.get(self.cursor.where_from(first))
+        with self._lock:
+            # the fetched range reaches the end of the sheet, so it also tells about deleted rows
+            self.rows[first - 1:] = fetched
+            self._save()
+            return self.snapshot()
+
+    def set_row(self, row_id, values, save=True):
+        with self._lock:
+            if len(self.rows) < row_id:
+                self.rows.extend([] for _ in range(row_id - len(self.rows)))
+            self.rows[row_id - 1] = list(values)
+            if save:
+                self._save()
+
+    def snapshot(self):
+        return [list(row) for row in self.rows]
+
+    def save(self):
+        with self._lock:
+            self._save()
+
+    def _save(self):
+        with open(self.path, 'w') as mirror:
+            json.dump(
+                {'sheet_id': self.g_sheet.sheet_id, 'range': self.cursor.where('get'), 'rows': self.rows},
+                mirror, ensure_ascii=False,
+            )
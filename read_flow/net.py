@@ -0,0 +1,55 @@
+import os
+import threading
+import time
+import urllib.parse
+
+import requests
+import requests.adapters
+
+_local = threading.local()
+
+
+def session() -> requests.Session:
+    """ keep-alive session of the current thread """
+    if (s := getattr(_local, 'session', None)) is None:
+        s = _local.session = requests.Session()
+        s.mount('https://', requests.adapters.HTTPAdapter(pool_maxsize=4))
+    return s
+
+
+class HostLimiter:
+    """ At most :rate: requests per second to every host,
+    configured as RF_HOST_RATE="tophonetics.com=4,translate.google.ru=10"
+    """
+
+    def __init__(self, rates: dict, default=None):
+        self.rates = rates
+        self.default = default
+        self._next_at = {}
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_env(cls):
+        rates = dict(
+            pair.split('=', 1)
+            for pair in os.getenv('RF_HOST_RATE', '').split(',') if pair
+        )
+        default = float(os.getenv('RF_DEFAULT_HOST_RATE', 5)) or None
+        return cls({host: float(rate) for host, rate in rates.items()}, default)
+
+    def wait(self, host):
+        if (rate := self.rates.get(host, self.default)) is None:
+            return
+        with self._lock:
+            now = time.monotonic()
+            at = max(now, self._next_at.get(host, now))
+            self._next_at[host] = at + 1 / rate
+        time.sleep(at - now)
+
+
+limiter = HostLimiter.from_env()
+
+
+def post(url, **kwargs) -> requests.Response:
+    limiter.wait(urllib.parse.urlsplit(url).hostname)
+    return session().post(url, **kwargs)
@@ -0,0 +1,38 @@
+import concurrent.futures
+import threading
+from typing import Callable, Optional
+
+
+class Prefetcher:
+    """ Starts :lookup: of a copied word before any hotkey asks for it.
+    Copying the same word again reuses the running lookup, copying another one
+    cancels the previous lookup if it has not started yet and forgets it anyway
+    """
+
+    def __init__(self, lookup: Callable[[str], tuple], workers=2):
+        self.lookup = lookup
+        self._pool = concurrent.futures.ThreadPoolExecutor(workers)
+        self._futures: dict[str, concurrent.futures.Future] = {}
+        self._current = None
+        self._lock = threading.Lock()
+
+    def start(self, word):
+        with self._lock:
+            if word != self._current and (stale := self._futures.pop(self._current, None)):
+                stale.cancel()
+            if word not in self._futures:
+                self._futures[word] = self._pool.submit(self.lookup, word)
+            self._current = word
+
+    def take(self, word) -> Optional[tuple]:
+        """ Result of the lookup started for :word:, waits for it when in flight """
+        with self._lock:
+            future = self._futures.pop(word, None)
+            if word == self._current:
+                self._current = None
+        if future is None or future.cancelled():
+            return None
+        try:
+            return future.result()
+        except Exception:
+            return None
@@ -0,0 +1,246 @@
+""" Google Sheets access without the interactive part of read_flow,
+google client modules are imported on first use
+"""
+
+from typing import Literal
+import concurrent.futures
+import dataclasses
+import functools
+import hashlib
+import json
+import os
+import pathlib
+import sys
+import threading
+
+from . import stats
+from . import utils
+
+CACHE_DIR = pathlib.Path(os.getenv('RF_CACHE_DIR', pathlib.Path.home() / '.cache' / 'read_flow'))
+
+
+@dataclasses.dataclass
+class Cursor:
+    sheet_name: str
+    column: str
+    row: int
+
+    def where(self, op: Literal['get', 'update']):
+        c = chr(ord(self.column) + 2)
+        pattern = '{0}!{1}{2}:{3}{2}'
+        if op == 'get':
+            pattern = pattern.replace('{2}', '')
+        return pattern.format(*dataclasses.astuple(self), c)
+
+    def where_row(self, row_id):
+        c = chr(ord(self.column) + 2)
+        pattern = '{0}!{1}{4}:{3}{4}'
+        return pattern.format(*dataclasses.astuple(self), c, row_id)
+
+    def where_from(self, row_id):
+        c = chr(ord(self.column) + 2)
+        pattern = '{0}!{1}{4}:{3}'
+        return pattern.format(*dataclasses.astuple(self), c, row_id)
+
+
+class GoogleSheet:
+    SCOPES = ['https://www.googleapis.com/auth/spreadsheets']
+    flush_size = int(os.getenv('RF_FLUSH_SIZE', 50))
+    flush_delay = float(os.getenv('RF_FLUSH_DELAY', 2))
+    # failed flushes in a row before the pending ranges are given up
+    flush_retries = int(os.getenv('RF_FLUSH_RETRIES', 3))
+    log_file = sys.stderr  # the interactive mode points it to Output.log_file
+    # a stand-in like read_flow.fake_server, signed.pwd is not needed then
+    endpoint = os.getenv('RF_SHEETS_ENDPOINT')
+
+    __shared: 'GoogleSheet' = None
+    __shared_lock = threading.Lock()
+
+    def __init__(self):
+        import google.oauth2.credentials
+        from googleapiclient.discovery import build
+
+        if self.endpoint:
+            import google.auth.credentials
+
+            self._client_config, self.sheet_id = {}, os.getenv('RF_SHEET_ID', 'local')
+            self.creds = google.auth.credentials.AnonymousCredentials()
+            self.service = build(
+                'sheets', 'v4', credentials=self.creds, cache_discovery=False,
+                discoveryServiceUrl=self.endpoint.rstrip('/') + '/$discovery/rest?version={apiVersion}',
+            )
+        else:
+            self._client_config, c2, self.sheet_id = self._decrypting()
+            self.creds = google.oauth2.credentials.Credentials.from_authorized_user_info(c2)
+            self.service = build('sheets', 'v4', credentials=self.creds, cache=DiscoveryCache())
+        self.sheet = self.service.spreadsheets()
+        # httplib2 is not thread-safe, every request goes under the lock
+        self._lock = threading.RLock()
+        self._pending = {}
+        self._timer = None
+        self._failed_flushes = 0
+
+    @classmethod
+    def shared(cls) -> 'GoogleSheet':
+        """ One instance per process, credentials and the service are built once """
+        with cls.__shared_lock:
+            if cls.__shared is None:
+                cls.__shared = cls()
+        return cls.__shared
+
+    @functools.cached_property
+    def flow(self):
+        from google_auth_oauthlib.flow import InstalledAppFlow
+        return InstalledAppFlow.from_client_config(self._client_config, self.SCOPES)
+
+    @stats.timed('sheet.get')
+    def get(self, requested_range):
+        with self._lock:
+            self.flush()
+            return self.sheet.values().get(
+                spreadsheetId=self.sheet_id,
+                range=requested_range,
+            ).execute().get('values', [])
+
+    @stats.timed('sheet.batch_get')
+    def batch_get(self, ranges):
+        with self._lock:
+            self.flush()
+            value_ranges = self.sheet.values().batchGet(
+                spreadsheetId=self.sheet_id,
+                ranges=ranges,
+            ).execute()['valueRanges']
+        return [vr.get('values', []) for vr in value_ranges]
+
+    @stats.timed('sheet.update')
+    def update(self, requested_range, body) -> concurrent.futures.Future:
+        """ Buffered, written by flush() on :flush_size: pending ranges,
+        :flush_delay: seconds after the first one or before any get().
+        The returned future is done once the range is written or given up
+        """
+        written = concurrent.futures.Future()
+        with self._lock:
+            _, waiting = self._pending.get(requested_range, (None, []))
+            self._pending[requested_range] = ([list(body)], [*waiting, written])
+            if len(self._pending) >= self.flush_size:
+                self.flush()
+            elif self._timer is None:
+                self._timer = threading.Timer(self.flush_delay, self.flush)
+                self._timer.daemon = True
+                self._timer.start()
+        return written
+
+    @stats.timed('sheet.flush')
+    def flush(self):
+        """ Raises when the batch could not be sent, ranges the sheet rejects
+        are dropped one by one and reported only by their futures
+        """
+        with self._lock:
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+            if not self._pending:
+                return
+            pending, self._pending = self._pending, {}
+            try:
+                self._write(pending)
+            except Exception as e:
+                left = {r: entry for r, entry in pending.items() if not entry[1][-1].done()}
+                self._failed_flushes += 1
+                if self._failed_flushes > self.flush_retries:
+                    self._failed_flushes = 0
+                    self._give_up(left, e)
+                else:
+                    self._pending = {**left, **self._pending}
+                raise
+            self._failed_flushes = 0
+
+    def _write(self, pending: dict):
+        """ A batch rejected with a client error (400 on a bad range, ...) is halved
+        until the rejected ranges are alone, so the rest of it still gets written
+        """
+        try:
+            (self.sheet.values()
+             .batchUpdate(spreadsheetId=self.sheet_id,
+                          body={'valueInputOption': 'RAW',
+                                'data': [{'range': r, 'values': v} for r, (v, _) in pending.items()]})
+             ).execute()
+        except Exception as e:
+            status = int(getattr(getattr(e, 'resp', None), 'status', 0))
+            if not (400 <= status < 500 and status != 429):
+                raise
+            if len(pending) == 1:
+                return self._give_up(pending, e)
+            ranges = list(pending.items())
+            self._write(dict(ranges[:len(ranges) // 2]))
+            self._write(dict(ranges[len(ranges) // 2:]))
+            return
+        for _, waiting in pending.values():
+            for written in waiting:
+                written.set_result(True)
+
+    def _give_up(self, pending: dict, e: Exception):
+        self.log_file.write(f'dropped writes to {", ".join(pending)}: {e!r}\n')
+        for _, waiting in pending.values():
+            for written in waiting:
+                written.set_exception(e)
+
+    @classmethod
+    def generate_signed_files(cls, path_to_cred, sheet_id):
+        """
+        To get :path_to_cred, please, visit
+        https://developers.google.com/sheets/api/quickstart/python#step_1_turn_on_the
+        """
+        from google_auth_oauthlib.flow import InstalledAppFlow
+
+        tokens = []
+        with open(path_to_cred) as c1:
+            tokens.append(json.load(c1))
+        flow = InstalledAppFlow.from_client_secrets_file(path_to_cred, cls.SCOPES)
+        tokens.append(json.loads(flow.run_console().to_json()))
+        sign = utils.encrypt(json.dumps({'tokens': tokens, 'sheet_id': sheet_id}), os.getenv('RF_TOKEN'))
+        with open('signed.pwd', 'w') as signed:
+            i = 0
+            while i <= len(sign):
+                signed.write(sign[i:i+80] + '\n')
+                i += 80
+
+    @staticmethod
+    def _decrypting():
+        """ The decrypted payload is kept in CACHE_DIR (readable by the owner only)
+        under a hash of signed.pwd and RF_TOKEN, so a new sign or token misses it
+        """
+        with open(pathlib.Path(__file__).parent / 'signed.pwd') as signed:
+            sign = signed.read().replace('\n', '')
+        key = hashlib.sha256((sign + os.getenv('RF_TOKEN', '')).encode()).hexdigest()
+        cached = CACHE_DIR / f'signed-{key[:16]}.json'
+        try:
+            with open(cached) as payload_file:
+                payload = json.load(payload_file)
+        except (FileNotFoundError, json.JSONDecodeError):
+            payload = json.loads(utils.decrypt(sign, os.getenv('RF_TOKEN')))
+            CACHE_DIR.mkdir(parents=True, exist_ok=True)
+            fd = os.open(cached, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+            with open(fd, 'w') as payload_file:
+                json.dump(payload, payload_file)
+        return payload['tokens'] + [payload['sheet_id']]
+
+
+class DiscoveryCache:
+    """ googleapiclient.discovery_cache.base.Cache kept in CACHE_DIR """
+
+    def get(self, url):
+        try:
+            with open(self._path(url)) as doc:
+                return doc.read()
+        except FileNotFoundError:
+            return None
+
+    def set(self, url, content):
+        CACHE_DIR.mkdir(parents=True, exist_ok=True)
+        with open(self._path(url), 'w') as doc:
+            doc.write(content)
+
+    @staticmethod
+    def _path(url):
+        return CACHE_DIR / f'discovery-{hashlib.sha256(url.encode()).hexdigest()[:16]}.json'
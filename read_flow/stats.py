@@ -0,0 +1,86 @@
+""" Rolling latency histograms of network calls and rendering,
+shown by the `stats` command and optionally dumped to RF_STATS_FILE
+"""
+
+import collections
+import functools
+import json
+import os
+import statistics
+import threading
+import time
+
+window = int(os.getenv('RF_STATS_WINDOW', 1000))
+_lock = threading.Lock()
+_timings: dict[str, collections.deque] = collections.defaultdict(lambda: collections.deque(maxlen=window))
+_calls = collections.Counter()
+_errors = collections.Counter()
+
+
+def timed(name):
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            started_at = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            except Exception:
+                error(name)
+                raise
+            finally:
+                record(name, time.perf_counter() - started_at)
+        return wrapper
+    return decorator
+
+
+def record(name, seconds):
+    with _lock:
+        _timings[name].append(seconds)
+        _calls[name] += 1
+
+
+def error(name):
+    with _lock:
+        _errors[name] += 1
+
+
+def snapshot() -> dict:
+    with _lock:
+        timings = {name: list(durations) for name, durations in _timings.items()}
+        calls, errors = dict(_calls), dict(_errors)
+    result = {}
+    for name in sorted(timings.keys() | errors.keys()):
+        durations = timings.get(name, [])
+        q = statistics.quantiles(durations, n=100) if len(durations) > 1 else durations * 99
+        result[name] = {
+            'calls': calls.get(name, 0),
+            'errors': errors.get(name, 0),
+            **({'p50_ms': q[49] * 1000, 'p95_ms': q[94] * 1000, 'p99_ms': q[98] * 1000} if q else {}),
+        }
+    return result
+
+
+def report() -> str:
+    lines = [f'{"":24}{"calls":>8}{"errors":>8}{"p50, ms":>10}{"p95, ms":>10}{"p99, ms":>10}']
+    for name, s in snapshot().items():
+        lines.append(
+            f'{name:24}{s["calls"]:>8}{s["errors"]:>8}'
+            + ''.join(f'{s.get(k, float("nan")):>10.1f}' for k in ('p50_ms', 'p95_ms', 'p99_ms'))
+        )
+    return '\r\n'.join(lines) + '\r\n'
+
+
+def export_periodically(path, interval):
+    def target():
+        while True:
+            time.sleep(interval)
+            with open(path, 'w') as stats_file:
+                json.dump(snapshot(), stats_file, indent=2)
+    threading.Thread(target=target, daemon=True).start()
+
+
+def reset():
+    with _lock:
+        _timings.clear()
+        _calls.clear()
+        _errors.clear()
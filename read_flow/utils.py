@@ -1,12 +1,13 @@
 import os
 import base64
-from cryptography.fernet import Fernet
-from cryptography.hazmat.backends import default_backend
-from cryptography.hazmat.primitives import hashes
-from cryptography.hazmat.primitives.kdf.pbkdf2 import PBKDF2HMAC
 
 
 def _cipher_fernet(password: str):
+    from cryptography.fernet import Fernet
+    from cryptography.hazmat.backends import default_backend
+    from cryptography.hazmat.primitives import hashes
+    from cryptography.hazmat.primitives.kdf.pbkdf2 import PBKDF2HMAC
+
     salt = int.from_bytes(password.encode(), byteorder='little') ^ 846546764546775454
     key = PBKDF2HMAC(algorithm=hashes.SHA256(), length=32, salt=str(salt).encode(), iterations=1000,
                      backend=default_backend()).derive(password.encode())
@@ -22,7 +23,10 @@ def decrypt(ciphertext: str, password: str):
 
 
 def paste():
-    txt = os.popen('xsel -b').read()
+    return normalize(os.popen('xsel -b').read())
+
+
+def normalize(txt):
     txt = txt.replace('\u2010\n', '').replace('\n', ' ')
     while '  ' in txt:
         txt = txt.replace('  ', ' ')
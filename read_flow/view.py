@@ -0,0 +1,119 @@
+import bisect
+import collections
+
+import rich.box
+import rich.console
+import rich.table
+
+
+class TableView:
+    """ Draws only the rows around the cursor that fit the terminal.
+    A row is rendered once per (content, selection, width) and the screen
+    is repainted line by line, only where it differs from the last frame
+    """
+    cache_size = 4096
+
+    def __init__(self, console: rich.console.Console, column_width=12):
+        self.console = console
+        self.column_width = column_width
+        self._rows = collections.OrderedDict()
+        self._frame: list[str] = []
+        self._size = None
+        self._columns = 3
+        self.top = 0  # row_id of the first row on the screen
+
+    def invalidate(self):
+        """ Something else was printed, the next paint redraws everything """
+        self._frame = []
+
+    def paint(self, titles, rows, selected):
+        """ :rows: are (row_id, cells, style) sorted by row_id, at least the ones
+        of the window, see window(); :selected: is a row_id, possibly past the rows
+        """
+        self.repaint(self.frame(titles, rows, selected))
+
+    def frame(self, titles, rows, selected) -> list[str]:
+        height = self.console.size.height - 1  # the last line is for commands
+        self._columns = len(titles)
+        header = self._render(tuple(titles), header=True)
+        row_ids = [row_id for row_id, *_ in rows]
+        # the cursor may stand on an empty row after the data, the nearest row keeps the window there
+        index = min(bisect.bisect_left(row_ids, selected), len(rows) - 1)
+        # keep the window in place while the selected row is inside it,
+        # so moving the cursor repaints only two rows
+        lines, used = {}, len(header)
+        for i in range(bisect.bisect_left(row_ids, self.top), len(rows)):
+            block = self._row(rows[i], selected)
+            if used + len(block) > height:
+                break
+            lines[i] = block
+            used += len(block)
+        if index in lines or not rows:
+            return self._compose(header, rows, lines)
+
+        lines = {index: self._row(rows[index], selected)}
+        used = len(header) + len(lines[index])
+        above, below = index - 1, index + 1
+        # grow the window around the selected row while the rows fit
+        while above >= 0 or below < len(rows):
+            for i in (below, above):
+                if 0 <= i < len(rows) and i not in lines:
+                    block = self._row(rows[i], selected)
+                    if used + len(block) > height:
+                        return self._compose(header, rows, lines)
+                    lines[i] = block
+                    used += len(block)
+            above, below = above - 1, below + 1
+        return self._compose(header, rows, lines)
+
+    def repaint(self, frame):
+        size = self.console.size
+        out = []
+        if size != self._size or not self._frame:
+            self._size = size
+            self._frame = []
+            out.append('\033[2J')
+        for i, line in enumerate(frame):
+            if i >= len(self._frame) or self._frame[i] != line:
+                out.append(f'\033[{i + 1};1H{line}\033[K')
+        for i in range(len(frame), len(self._frame)):
+            out.append(f'\033[{i + 1};1H\033[K')
+        self._frame = frame
+        self.console.file.write(''.join(out))
+        self.console.file.flush()
+
+    def window(self, selected, first, last) -> range:
+        """ row_ids paint() needs of the ones from :first: to :last:, every row takes a line at least """
+        height = self.console.size.height
+        selected = min(max(selected, first), last)
+        if self.top <= selected < self.top + height:
+            return range(max(self.top, first), min(self.top + height, last + 1))
+        return range(max(selected - height, first), min(selected + height, last) + 1)
+
+    def _compose(self, header, rows, lines):
+        self.top = rows[min(lines)][0] if lines else 0
+        return header + [line for i in sorted(lines) for line in lines[i]]
+
+    def _row(self, row, selected):
+        row_id, cells, style = row
+        return self._render(tuple(cells), style='blue bold' if row_id == selected else style)
+
+    def _render(self, cells, header=False, style=None) -> list[str]:
+        key = cells, header, style, self._columns, self.console.width
+        if (lines := self._rows.get(key)) is not None:
+            self._rows.move_to_end(key)
+            return lines
+        table = rich.table.Table(show_header=header, show_edge=False, box=rich.box.SQUARE)
+        for title in (cells if header else [None] * self._columns):
+            table.add_column(title, style='dim', overflow='fold', width=self.column_width)
+        if not header:
+            table.add_row(*cells, style=style)
+        with self.console.capture() as capture:
+            self.console.print(table, markup=False)
+        lines = [line.rstrip('\r') for line in capture.get().split('\n') if line.strip('\r')]
+        if not header:
+            lines.append('┼'.join(['─' * (self.column_width + 2)] * self._columns))
+        self._rows[key] = lines
+        if len(self._rows) > self.cache_size:
+            self._rows.popitem(last=False)
+        return lines
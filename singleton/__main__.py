@@ -35,16 +35,55 @@ async def log_slug():
 async def migrate_db(db: aiopg.sa.Engine):
     with open('db.sql') as sql:
         async with db.acquire() as conn:
-            await conn.execute(sql.read())
+            # a raw cursor without parameters, so the %I/%L of format() reach the server as they are
+            async with conn.connection.cursor() as cursor:
+                await cursor.execute(sql.read())
 
 
-async def check_logs(db: aiopg.sa.Engine):
+async def check_logs(
+        db: aiopg.sa.Engine, *,
+        levels=None, since=None, until=None,
+        fmt='array', chunk_size=1000,
+):
+    """ Streams app_log to db_dump.json through a server-side cursor
+    :fmt: 'array' for one JSON array or 'jsonl' for one record per line
+    """
+    # named parameters: a list starting with a list would be taken for many parameter sets
+    conditions, params = ['true'], {}
+    if levels:
+        conditions.append('l.level = any(%(levels)s)')
+        params['levels'] = list(levels)
+    if since is not None:
+        conditions.append('l.created_at >= %(since)s')
+        params['since'] = since
+    if until is not None:
+        conditions.append('l.created_at < %(until)s')
+        params['until'] = until
+
     with open('db_dump.json', 'w') as dump_file:
         async with db.acquire() as conn:
-            records = await conn.execute('select * from app_log;')
-            logs = await records.fetchall()
-            obj = [dict(log) for log in logs]
-        fast_json.dump(obj, dump_file, indent=2)
+            async with conn.begin():
+                await conn.execute(f'''
+                    declare app_log_export no scroll cursor for
+                    select l.id, l.level, l.msg, l.created_at, c.context
+                    from app_log l
+                    left join log_context c on c.fingerprint = l.context_id
+                    where {' and '.join(conditions)};
+                ''', params)
+                first = True
+                dump_file.write('[\n' if fmt == 'array' else '')
+                while logs := await (await conn.execute(
+                        f'fetch forward {int(chunk_size)} from app_log_export;'
+                )).fetchall():
+                    for log in logs:
+                        if fmt == 'array':
+                            dump_file.write('' if first else ',\n')
+                            fast_json.dump(dict(log), dump_file, indent=2)
+                        else:
+                            fast_json.dump(dict(log), dump_file)
+                            dump_file.write('\n')
+                        first = False
+                dump_file.write('\n]\n' if fmt == 'array' else '')
 
 
 async def main():
@@ -52,7 +91,6 @@ async def main():
         db = await aiopg.sa.create_engine(dsn=os.getenv('DATABASE_URL'))
         await migrate_db(db)
         await log_slug()
-        await asyncio.sleep(5)  # give at most 5 sec to logs sending
     await check_logs(db)
     db.close()
     await db.wait_closed()
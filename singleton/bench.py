@@ -0,0 +1,75 @@
+""" Throughput of Logger for every sink:
+    python -m singleton.bench --threads 8 --records 20000
+Postgres is measured only when DATABASE_URL is set and migrated (see db.sql)
+"""
+
+import argparse
+import asyncio
+import base64
+import os
+import statistics
+import tempfile
+import threading
+import time
+
+from .logger import Logger
+from . import sinks
+
+
+def produce(logger: Logger, count, latencies: list):
+    for _ in range(count):
+        msg = base64.encodebytes(os.urandom(32))
+        started_at = time.perf_counter_ns()
+        logger.info(msg=msg)
+        latencies.append(time.perf_counter_ns() - started_at)
+
+
+async def measure(sink: sinks.Sink, threads, records):
+    logger = Logger()
+    logger.sink = sink
+    latencies = [[] for _ in range(threads)]
+    workers = [
+        threading.Thread(target=produce, args=(logger, records // threads, latencies[i]))
+        for i in range(threads)
+    ]
+    loop = asyncio.get_event_loop()
+    async with logger:
+        started_at = time.perf_counter()
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            # the writer shares this loop, so do not block it on join
+            await loop.run_in_executor(None, worker.join)
+        enqueued_at = time.perf_counter()
+    drained_at = time.perf_counter()
+
+    latencies = sorted(ns for part in latencies for ns in part)
+    quantiles = statistics.quantiles(latencies, n=100)
+    return {
+        'records': len(latencies),
+        'records/sec': len(latencies) / (drained_at - started_at),
+        'enqueue p50, us': quantiles[49] / 1000,
+        'enqueue p99, us': quantiles[98] / 1000,
+        'drain, sec': drained_at - enqueued_at,
+    }
+
+
+async def main(threads, records):
+    with tempfile.TemporaryDirectory() as tmp:
+        candidates = {
+            'sqlite': sinks.SqliteSink(os.path.join(tmp, 'app_log.db')),
+            'file': sinks.FileSink(os.path.join(tmp, 'app_log.jsonl')),
+        }
+        if dsn := os.getenv('DATABASE_URL'):
+            candidates['postgres'] = sinks.PostgresSink(dsn)
+        for name, sink in candidates.items():
+            result = await measure(sink, threads, records)
+            print(name.ljust(10), '  '.join(f'{k}: {v:.2f}' for k, v in result.items()))
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--threads', type=int, default=8)
+    parser.add_argument('--records', type=int, default=20000)
+    args = parser.parse_args()
+    asyncio.run(main(args.threads, args.records))
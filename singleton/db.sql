@@ -1,8 +1,59 @@
 drop table if exists app_log;
+drop table if exists log_context;
+create table log_context (
+    fingerprint char(40) primary key,
+    context text[] not null
+);
 create table app_log (
-    id serial primary key,
+    id bigserial,
+    uid uuid not null,
     level varchar(16) default 'INFO',
     msg text not null,
-    created_at timestamp default now(),
-    context text[]
-);
+    created_at timestamp not null default now(),
+    context_id char(40) references log_context (fingerprint),
+    primary key (id, created_at),
+    unique (uid, created_at)
+) partition by range (created_at);
+create index app_log_level_created_at on app_log (level, created_at);
+create table app_log_default partition of app_log default;
+
+-- one partition per day, named app_log_pYYYYMMDD; the default partition catches the rest,
+-- rows it already holds for a new day are moved into that day's partition
+create or replace function app_log_add_partitions(days_ahead int default 2) returns void as $$
+declare
+    day date;
+    part text;
+begin
+    for day in select generate_series(current_date, current_date + days_ahead, interval '1 day')::date loop
+        part := 'app_log_p' || to_char(day, 'YYYYMMDD');
+        continue when to_regclass(part) is not null;
+        execute format('create table %I (like app_log including defaults including constraints)', part);
+        execute format(
+            'with moved as (delete from app_log_default where created_at >= %L and created_at < %L returning *)'
+            ' insert into %I select * from moved',
+            day, day + 1, part
+        );
+        execute format('alter table app_log attach partition %I for values from (%L) to (%L)', part, day, day + 1);
+    end loop;
+end
+$$ language plpgsql;
+
+create or replace function app_log_drop_partitions(max_age interval) returns setof text as $$
+declare
+    part record;
+begin
+    for part in
+        select c.relname from pg_inherits i
+        join pg_class c on c.oid = i.inhrelid
+        where i.inhparent = 'app_log'::regclass
+          and c.relname ~ '^app_log_p\d{8}$'
+          and to_date(substring(c.relname from 10), 'YYYYMMDD') + 1 <= now() - max_age
+    loop
+        execute format('drop table %I', part.relname);
+        return next part.relname;
+    end loop;
+    delete from app_log_default where created_at < now() - max_age;
+end
+$$ language plpgsql;
+
+select app_log_add_partitions();
@@ -0,0 +1,98 @@
+import collections
+import os
+import random
+import threading
+import time
+
+LEVELS = {'DEBUG': 10, 'INFO': 20, 'WARN': 30, 'ERROR': 40}
+
+
+def _pairs(value):
+    """ 'a=1,b=2' -> {'a': '1', 'b': '2'} """
+    return dict(pair.split('=', 1) for pair in (value or '').split(',') if pair)
+
+
+class TokenBucket:
+    def __init__(self, rate, burst):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.updated_at = time.monotonic()
+
+    def take(self):
+        now = time.monotonic()
+        self.tokens = min(self.burst, self.tokens + (now - self.updated_at) * self.rate)
+        self.updated_at = now
+        if self.tokens < 1:
+            return False
+        self.tokens -= 1
+        return True
+
+
+class LogFilter:
+    """ Decides whether a record is worth capturing at all.
+    Checks are ordered from the cheapest: level threshold, module threshold,
+    sampling and then the token bucket of the call site
+    """
+
+    def __init__(self, level='DEBUG', module_levels=None, sampling=None, rate=None, burst=None):
+        self.level = LEVELS[level]
+        self.module_levels = {m: LEVELS[lvl] for m, lvl in (module_levels or {}).items()}
+        self.sampling = {lvl: float(p) for lvl, p in (sampling or {}).items()}
+        self.rate = rate
+        self.burst = burst or rate
+        self.suppressed = collections.Counter()
+        self._module_cache = {}
+        self._buckets = {}
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_env(cls):
+        return cls(
+            level=os.getenv('LOG_LEVEL', 'DEBUG'),
+            module_levels=_pairs(os.getenv('LOG_MODULE_LEVELS')),  # app.db=WARN,app.api=INFO
+            sampling=_pairs(os.getenv('LOG_SAMPLING')),  # DEBUG=0.01,INFO=0.5
+            rate=float(os.getenv('LOG_RATE_LIMIT', 0)) or None,  # records per second per call site
+            burst=float(os.getenv('LOG_RATE_BURST', 0)) or None,
+        )
+
+    def allow(self, level, frame):
+        rank = LEVELS[level]
+        if rank < self.level:
+            return False
+        if self.module_levels and rank < self._module_level(frame.f_globals.get('__name__', '')):
+            return False
+        if level in self.sampling and random.random() >= self.sampling[level]:
+            self._suppress(frame)
+            return False
+        if self.rate is not None:
+            site = frame.f_code, frame.f_lineno
+            with self._lock:
+                if (bucket := self._buckets.get(site)) is None:
+                    bucket = self._buckets[site] = TokenBucket(self.rate, self.burst)
+                if not bucket.take():
+                    self.suppressed[site] += 1
+                    return False
+        return True
+
+    def pop_suppressed(self):
+        """ Returns {(code, lineno): count} suppressed since the last call """
+        with self._lock:
+            suppressed, self.suppressed = self.suppressed, collections.Counter()
+        return suppressed
+
+    def _suppress(self, frame):
+        with self._lock:
+            self.suppressed[frame.f_code, frame.f_lineno] += 1
+
+    def _module_level(self, module):
+        if (rank := self._module_cache.get(module)) is None:
+            # the longest configured prefix wins: app.db.pool -> app.db -> app
+            parts = module.split('.')
+            rank = next((
+                self.module_levels['.'.join(parts[:i])]
+                for i in range(len(parts), 0, -1)
+                if '.'.join(parts[:i]) in self.module_levels
+            ), 0)
+            self._module_cache[module] = rank
+        return rank
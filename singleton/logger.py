@@ -1,12 +1,24 @@
 import os
+import sys
+import time
+import uuid
+import linecache
 import traceback
 import functools
+import hashlib
+import threading
 import janus
 import asyncio
-import aiopg.sa
+
+from . import relay
+from . import sinks
+from .spool import Spool
+from .filters import LogFilter
 
 
 class Logger:
+    OVERFLOW_POLICIES = 'block', 'drop_newest', 'drop_oldest', 'drop_low'
+    LOW_LEVELS = 'DEBUG', 'INFO'
     __instance = None
 
     def __new__(cls, *args, **kwargs):
@@ -18,20 +30,121 @@ class Logger:
     @classmethod
     def _call_once(cls):
         cls.__instance._dsn = os.getenv('DATABASE_URL')
+        cls.__instance.sink = None  # overrides the one chosen by DATABASE_URL, see sinks.from_dsn
+        cls.__instance._sink = None
+        cls.__instance.batch_size = int(os.getenv('LOG_BATCH_SIZE', 500))
+        cls.__instance.flush_interval = int(os.getenv('LOG_FLUSH_INTERVAL_MS', 200)) / 1000
+        cls.__instance.context_mode = os.getenv('LOG_CONTEXT', 'eager')  # eager | lazy
+        cls.__instance.stack_depth = int(os.getenv('LOG_STACK_DEPTH', 0)) or None
+        cls.__instance.filter = LogFilter.from_env()
+        cls.__instance.suppress_report_interval = float(os.getenv('LOG_SUPPRESS_REPORT', 60))
+        cls.__instance._reporter = None
+        cls.__instance.queue_size = int(os.getenv('LOG_QUEUE_SIZE', 0))
+        cls.__instance.overflow = os.getenv('LOG_OVERFLOW', 'block')
+        assert cls.__instance.overflow in cls.OVERFLOW_POLICIES
+        # with drop_low DEBUG/INFO may fill the queue only up to this share
+        cls.__instance.low_watermark = float(os.getenv('LOG_LOW_WATERMARK', 0.8))
+        # every record offered ends up counted once: written or still queued, or dropped (evicted ones too)
+        cls.__instance.queued = 0
+        cls.__instance.dropped = 0
+        cls.__instance.block_check_interval = 1  # seconds, how often a blocked producer checks the writer
+        cls.__instance._counters_lock = threading.Lock()
+        cls.__instance._loop_thread = None
+        cls.__instance.relay = os.getenv('LOG_RELAY')  # path to the unix socket
+        cls.__instance.relay_role = os.getenv('LOG_RELAY_ROLE', 'writer')  # writer | worker
+        cls.__instance._relay = None
+        cls.__instance.spool_dir = os.getenv('LOG_SPOOL_DIR')
+        cls.__instance.write_timeout = float(os.getenv('LOG_WRITE_TIMEOUT', 10))
+        cls.__instance._spool = None
+        cls.__instance.retention_days = int(os.getenv('LOG_RETENTION_DAYS', 0)) or None
+        cls.__instance.maintenance_interval = float(os.getenv('LOG_MAINTENANCE_INTERVAL', 3600))
+        cls.__instance._maintenance = None
         cls.__instance._queue = None
-        cls.__instance._db = None
         cls.__instance._wait = None
         cls.__instance.is_active = False
 
     def log(self, msg, *, level):
-        self._queue.sync_q.put_nowait({
+        if not self.filter.allow(level, sys._getframe(1)):
+            return
+        self._enqueue({
             'level': level,
             'msg': msg,
-            'context': [
+            'created_at': time.time(),
+            'context': self._capture_context(),
+        })
+
+    def _enqueue(self, record):
+        queue = self._queue.sync_q
+        # the writer runs on the loop thread, blocking there would never end
+        if self.overflow == 'block' and threading.get_ident() != self._loop_thread:
+            # a dead writer never makes room, give up on the record then
+            while not self._writer_done:
+                try:
+                    queue.put(record, timeout=self.block_check_interval)
+                except janus.SyncQueueFull:
+                    continue
+                with self._counters_lock:
+                    self.queued += 1
+                return
+            with self._counters_lock:
+                self.dropped += 1
+            return
+        with self._counters_lock:
+            # an unbounded queue (LOG_QUEUE_SIZE=0) never fills, nothing to make room for
+            if (self.overflow == 'drop_low' and self.queue_size > 0 and record['level'] in self.LOW_LEVELS
+                    and queue.qsize() >= self.queue_size * self.low_watermark):
+                self.dropped += 1
+                return
+            try:
+                queue.put_nowait(record)
+            except janus.SyncQueueFull:
+                self.dropped += 1
+                if self.overflow == 'drop_newest' or (self.overflow == 'drop_low' and record['level'] in self.LOW_LEVELS):
+                    return
+                # the evicted record was counted as queued, now it is a dropped one
+                if self.overflow == 'drop_low' and self._queue.evict(self.LOW_LEVELS) is not None:
+                    self.queued -= 1
+                else:
+                    try:
+                        if queue.get_nowait() is None:
+                            queue.put_nowait(None)  # keep the shutdown marker, drop the record
+                            return
+                        self.queued -= 1
+                    except janus.SyncQueueEmpty:
+                        pass
+                queue.put_nowait(record)
+            self.queued += 1
+
+    @property
+    def depth(self):
+        """ Records waiting for the writer """
+        return self._queue.sync_q.qsize() if self._queue is not None else 0
+
+    @property
+    def _writer_done(self):
+        return self._wait is not None and self._wait.done()
+
+    def _capture_context(self):
+        """ In lazy mode only (code, lineno) pairs are taken here,
+        they are turned into strings by the writer, see _render_context
+        """
+        if self.context_mode != 'lazy':
+            return [
                 f'{f.filename}:{f.lineno} {f.line}'
-                for f in traceback.extract_stack()
+                for f in traceback.extract_stack(sys._getframe(1), limit=self.stack_depth)
             ]
-        })
+        frames, f = [], sys._getframe(1)
+        while f is not None and len(frames) != self.stack_depth:
+            frames.append((f.f_code, f.f_lineno))
+            f = f.f_back
+        return tuple(reversed(frames))
+
+    @staticmethod
+    def _render_context(context):
+        """ Returns (fingerprint, context as list of strings) """
+        if isinstance(context, tuple):
+            return _resolve_stack(context)
+        return _fingerprint(context), context
 
     error = functools.partialmethod(log, level='ERROR')
     warn = functools.partialmethod(log, level='WARN')
@@ -41,25 +154,179 @@ class Logger:
     def __aiter__(self):
         return self
 
+    @property
+    def is_relay_worker(self):
+        return self.relay is not None and self.relay_role == 'worker'
+
     async def __aexit__(self, exc_type, exc_val, exc_tb):
         self.is_active = False
-        await self._queue.async_q.put(None)
+        if self._relay is not None and not self.is_relay_worker:
+            self._relay.close()
+            await self._relay.wait_closed()
+        if self._maintenance is not None:
+            self._maintenance.cancel()
+        self._reporter.cancel()
+        self._report_suppressed()
+        # a dead writer would leave the marker waiting on a full queue forever
+        marker = asyncio.ensure_future(self._queue.async_q.put(None))
+        await asyncio.wait([marker, self._wait], return_when=asyncio.FIRST_COMPLETED)
+        marker.cancel()
         await self._wait
-        self._db.close()
-        await self._db.wait_closed()
+        if self._spool is not None:
+            self._spool.seal()
+        await self._sink.close()
 
     async def __aenter__(self):
         self.is_active = True
-        self._queue = janus.Queue()
-        self._db = await aiopg.sa.create_engine(dsn=self._dsn)
+        self._queue = _Queue(maxsize=self.queue_size)
+        self._loop_thread = threading.get_ident()
+        if self.spool_dir is not None:
+            self._spool = Spool(self.spool_dir)
+        if self.is_relay_worker:
+            self._sink = sinks.RelaySink(self.relay)
+        else:
+            self._sink = self.sink or sinks.from_dsn(self._dsn)
+        try:
+            await self._sink.open()
+        except self._sink.errors:
+            if self._spool is None:
+                raise
+        if not self.is_relay_worker:
+            if self.relay is not None:
+                self._relay = await relay.serve(self.relay, self._queue.async_q)
+            self._maintenance = asyncio.ensure_future(self.maintain())
+        self._reporter = asyncio.ensure_future(self.report_suppressed())
         self._wait = asyncio.ensure_future(self.routine())
 
     async def routine(self):
+        if self._spool:
+            await self._replay()
+        while self.is_active:
+            await self._flush(await self._next_batch())
+        # __aexit__ is done waiting for producers, flush whatever is left
+        batch = []
+        while not self._queue.async_q.empty():
+            if (record := self._queue.async_q.get_nowait()) is not None:
+                batch.append(record)
+            if len(batch) >= self.batch_size:
+                await self._flush(batch)
+                batch = []
+        await self._flush(batch)
+
+    async def maintain(self):
+        while self.is_active:
+            try:
+                await self._sink.maintain(self.retention_days)
+            except self._sink.errors as e:
+                self._enqueue({
+                    'level': 'ERROR',
+                    'msg': f'log maintenance failed: {e!r}',
+                    'created_at': time.time(),
+                    'context': [f'{type(self._sink).__name__}.maintain'],
+                })
+            await asyncio.sleep(self.maintenance_interval)
+
+    async def report_suppressed(self):
         while self.is_active:
-            if (record := await self._queue.async_q.get()) is None:
-                continue
-            async with self._db.acquire() as conn:
-                await conn.execute('''
-                    insert into app_log (level, msg, context)
-                    values (%s, %s, %s);
-                ''', (record['level'], record['msg'], record['context']))
+            await asyncio.sleep(self.suppress_report_interval)
+            self._report_suppressed()
+
+    def _report_suppressed(self):
+        for (code, lineno), count in self.filter.pop_suppressed().items():
+            site = f'{code.co_filename}:{lineno}'
+            self._enqueue({
+                'level': 'INFO',
+                'msg': f'{count} records suppressed at {site}',
+                'created_at': time.time(),
+                'context': [site],
+            })
+
+    async def _next_batch(self):
+        """ Wait for the first record, then take more until
+        either batch_size records are collected or flush_interval is over
+        """
+        if (record := await self._queue.async_q.get()) is None:
+            return []
+        batch = [record]
+        loop = asyncio.get_event_loop()
+        deadline = loop.time() + self.flush_interval
+        while len(batch) < self.batch_size:
+            if self._queue.async_q.empty():
+                try:
+                    record = await asyncio.wait_for(self._queue.async_q.get(), deadline - loop.time())
+                except asyncio.TimeoutError:
+                    break
+            else:
+                record = self._queue.async_q.get_nowait()
+            if record is None:
+                break
+            batch.append(record)
+        return batch
+
+    async def _flush(self, batch):
+        """ Writes the batch, or spills it to the spool when the database
+        fails or stalls; the spool is replayed after the next good write
+        """
+        if not batch:
+            return
+        for record in batch:
+            # app_log.uid makes a replay of an already written record a no-op
+            record.setdefault('uid', str(uuid.uuid4()))
+        try:
+            await asyncio.wait_for(self._sink.write(self._portable(batch)), self.write_timeout)
+        except self._sink.errors + (asyncio.TimeoutError,):
+            if self._spool is None:
+                raise
+            self._spool.append(self._portable(batch))
+            return
+        if self._spool:
+            await self._replay()
+
+    async def _replay(self):
+        self._spool.seal()
+        for path in self._spool.segments():
+            records = list(self._spool.read(path))
+            try:
+                for i in range(0, len(records), self.batch_size):
+                    await asyncio.wait_for(
+                        self._sink.write(self._portable(records[i:i + self.batch_size])),
+                        self.write_timeout,
+                    )
+            except self._sink.errors + (asyncio.TimeoutError,):
+                return
+            path.unlink()
+
+    def _portable(self, batch):
+        """ Renders contexts, records from the relay or the spool already are.
+        Code objects of lazy contexts cannot leave the process anyway
+        """
+        portable = []
+        for record in batch:
+            if 'fingerprint' not in record:
+                fingerprint, context = self._render_context(record['context'])
+                record = dict(record, fingerprint=fingerprint, context=context)
+            portable.append(record)
+        return portable
+
+
+@functools.lru_cache(maxsize=4096)
+def _resolve_stack(frames):
+    context = [
+        f'{code.co_filename}:{lineno} {linecache.getline(code.co_filename, lineno).strip()}'
+        for code, lineno in frames
+    ]
+    return _fingerprint(context), context
+
+
+def _fingerprint(context):
+    return hashlib.sha1('\n'.join(context).encode()).hexdigest()
+
+
+class _Queue(janus.Queue):
+    def evict(self, levels):
+        """ Takes out the oldest record of one of :levels:, None if there is no such record """
+        with self._sync_mutex:
+            for i, record in enumerate(self._queue):
+                if record is not None and record['level'] in levels:
+                    del self._queue[i]
+                    return record
@@ -0,0 +1,80 @@
+""" Sends log batches from worker processes to one writer process
+over a local unix socket. Run a standalone writer with:
+    LOG_RELAY=/tmp/app_log.sock python -m singleton.relay
+and start workers with LOG_RELAY=/tmp/app_log.sock LOG_RELAY_ROLE=worker
+"""
+
+import asyncio
+import base64
+import json
+import os
+import signal
+import struct
+
+HEADER = struct.Struct('!I')
+
+
+async def send_batch(writer: asyncio.StreamWriter, batch: list):
+    payload = json.dumps([_encode(record) for record in batch]).encode()
+    writer.write(HEADER.pack(len(payload)) + payload)
+    await writer.drain()
+
+
+async def read_batches(reader: asyncio.StreamReader):
+    """ Batches are plain JSON, so whatever connects to the socket can't run code in the writer """
+    while True:
+        try:
+            size, = HEADER.unpack(await reader.readexactly(HEADER.size))
+            yield [_decode(record) for record in json.loads(await reader.readexactly(size))]
+        except asyncio.IncompleteReadError:
+            return
+        except (ValueError, TypeError, AttributeError):
+            return  # not a batch of records, drop the connection
+
+
+def _encode(record):
+    # bytes messages travel base64-encoded, see _decode
+    if isinstance(record['msg'], bytes):
+        return dict(record, msg=base64.b64encode(record['msg']).decode(), msg_base64=True)
+    return record
+
+
+def _decode(record):
+    if record.pop('msg_base64', False):
+        record['msg'] = base64.b64decode(record['msg'])
+    return record
+
+
+async def serve(path, queue):
+    """ Feeds records of every connected worker into the writer's queue,
+    a full queue stops reading, so workers see the backpressure
+    """
+    async def handle(reader, writer):
+        async for batch in read_batches(reader):
+            for record in batch:
+                await queue.put(record)
+        writer.close()
+
+    if os.path.exists(path):
+        try:
+            _, writer = await asyncio.open_unix_connection(path)
+        except (ConnectionRefusedError, FileNotFoundError):
+            os.unlink(path)  # left by a writer which is gone
+        else:
+            writer.close()
+            raise RuntimeError(f'a writer already serves {path}, start this process with LOG_RELAY_ROLE=worker')
+    return await asyncio.start_unix_server(handle, path=path)
+
+
+async def main():
+    from .logger import Logger
+
+    stop = asyncio.Event()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        asyncio.get_event_loop().add_signal_handler(sig, stop.set)
+    async with Logger():
+        await stop.wait()
+
+
+if __name__ == '__main__':
+    asyncio.run(main())
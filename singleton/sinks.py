@@ -0,0 +1,231 @@
+""" Destinations for Logger batches. A sink gets records with the context
+already rendered:
+    {'uid', 'created_at', 'level', 'msg', 'fingerprint', 'context'}
+"""
+
+import asyncio
+import concurrent.futures
+import datetime
+import json
+import sqlite3
+import urllib.parse
+
+import aiopg.sa
+import psycopg2
+
+from . import relay
+
+
+class Sink:
+    # exceptions which mean the sink is unavailable for now, see Logger._flush
+    errors = (OSError,)
+
+    def __init__(self):
+        self._known_contexts = set()
+
+    async def open(self):
+        pass
+
+    async def write(self, batch):
+        raise NotImplementedError
+
+    async def maintain(self, retention_days):
+        pass
+
+    async def close(self):
+        pass
+
+    def _new_contexts(self, batch):
+        """ {fingerprint: context} of the stacks not written by this sink yet """
+        return {
+            r['fingerprint']: r['context'] for r in batch
+            if r['fingerprint'] not in self._known_contexts
+        }
+
+
+class PostgresSink(Sink):
+    errors = (psycopg2.Error, OSError)
+
+    def __init__(self, dsn):
+        super().__init__()
+        self.dsn = dsn
+        self._db = None
+
+    async def open(self):
+        self._db = await aiopg.sa.create_engine(dsn=self.dsn)
+
+    async def write(self, batch):
+        if self._db is None:
+            await self.open()
+        contexts = self._new_contexts(batch)
+        async with self._db.acquire() as conn:
+            if contexts:
+                await conn.execute(f'''
+                    insert into log_context (fingerprint, context)
+                    values {', '.join(['(%s, %s)'] * len(contexts))}
+                    on conflict do nothing;
+                ''', [arg for item in contexts.items() for arg in item])
+                self._known_contexts.update(contexts)
+            await conn.execute(f'''
+                insert into app_log (uid, created_at, level, msg, context_id)
+                values {', '.join(['(%s, %s, %s, %s, %s)'] * len(batch))}
+                on conflict (uid, created_at) do nothing;
+            ''', [
+                arg for r in batch
+                for arg in (
+                    r['uid'], datetime.datetime.fromtimestamp(r['created_at']),
+                    r['level'], r['msg'], r['fingerprint'],
+                )
+            ])
+
+    async def maintain(self, retention_days):
+        """ Creates upcoming app_log partitions and drops the ones (and the rows
+        of the default partition) older than retention_days, see db.sql
+        """
+        if self._db is None:
+            return
+        async with self._db.acquire() as conn:
+            await conn.execute('select app_log_add_partitions();')
+            if retention_days is not None:
+                await conn.execute(
+                    "select app_log_drop_partitions(%s * interval '1 day');",
+                    (retention_days,),
+                )
+
+    async def close(self):
+        if self._db is not None:
+            self._db.close()
+            await self._db.wait_closed()
+            self._db = None
+
+
+class SqliteSink(Sink):
+    errors = (sqlite3.OperationalError, OSError)
+
+    def __init__(self, path):
+        super().__init__()
+        self.path = path
+        self._conn = None
+        # sqlite3 is blocking, all of its calls go through one thread
+        self._executor = concurrent.futures.ThreadPoolExecutor(max_workers=1)
+
+    async def _run(self, func, *args):
+        return await asyncio.get_event_loop().run_in_executor(self._executor, func, *args)
+
+    async def open(self):
+        await self._run(self._open)
+
+    def _open(self):
+        self._conn = sqlite3.connect(self.path, check_same_thread=False)
+        self._conn.executescript('''
+            pragma journal_mode = wal;
+            create table if not exists log_context (
+                fingerprint text primary key,
+                context text not null
+            );
+            create table if not exists app_log (
+                id integer primary key,
+                uid text not null unique,
+                level text default 'INFO',
+                msg text not null,
+                created_at timestamp,
+                context_id text references log_context (fingerprint)
+            );
+            create index if not exists app_log_level_created_at on app_log (level, created_at);
+        ''')
+
+    async def write(self, batch):
+        if self._conn is None:
+            await self.open()
+        contexts = self._new_contexts(batch)
+        await self._run(self._write, batch, contexts)
+        self._known_contexts.update(contexts)
+
+    def _write(self, batch, contexts):
+        with self._conn:
+            self._conn.executemany(
+                'insert or ignore into log_context (fingerprint, context) values (?, ?);',
+                [(fp, json.dumps(context)) for fp, context in contexts.items()],
+            )
+            self._conn.executemany(
+                'insert or ignore into app_log (uid, created_at, level, msg, context_id) values (?, ?, ?, ?, ?);',
+                [(
+                    r['uid'], datetime.datetime.fromtimestamp(r['created_at']).isoformat(' '),
+                    r['level'], r['msg'], r['fingerprint'],
+                ) for r in batch],
+            )
+
+    async def close(self):
+        if self._conn is not None:
+            await self._run(self._conn.close)
+            self._conn = None
+
+
+class FileSink(Sink):
+    """ JSON Lines, one record with its full context per line """
+
+    def __init__(self, path):
+        super().__init__()
+        self.path = path
+        self._file = None
+        self._executor = concurrent.futures.ThreadPoolExecutor(max_workers=1)
+
+    async def open(self):
+        self._file = open(self.path, 'a')
+
+    async def write(self, batch):
+        if self._file is None:
+            await self.open()
+        lines = ''.join(json.dumps({
+            'uid': r['uid'],
+            'created_at': datetime.datetime.fromtimestamp(r['created_at']).isoformat(' '),
+            'level': r['level'],
+            'msg': r['msg'].decode() if isinstance(r['msg'], bytes) else r['msg'],
+            'context': r['context'],
+        }) + '\n' for r in batch)
+        await asyncio.get_event_loop().run_in_executor(self._executor, self._write, lines)
+
+    def _write(self, lines):
+        self._file.write(lines)
+        self._file.flush()
+
+    async def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+
+class RelaySink(Sink):
+    """ Sends batches to the writer process, see relay.py """
+
+    def __init__(self, path):
+        super().__init__()
+        self.path = path
+        self._writer = None
+
+    async def open(self):
+        _, self._writer = await asyncio.open_unix_connection(self.path)
+
+    async def write(self, batch):
+        if self._writer is None:
+            await self.open()
+        try:
+            await relay.send_batch(self._writer, batch)
+        except OSError:
+            self._writer = None  # reconnect on the next write
+            raise
+
+    async def close(self):
+        if self._writer is not None:
+            self._writer.close()
+            self._writer = None
+
+
+def from_dsn(dsn):
+    """ postgres://..., sqlite:///path/to/app_log.db or file:///path/to/app_log.jsonl """
+    url = urllib.parse.urlparse(dsn)
+    if url.scheme == 'sqlite':
+        return SqliteSink(url.path)
+    if url.scheme == 'file':
+        return FileSink(url.path)
+    return PostgresSink(dsn)
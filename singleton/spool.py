@@ -0,0 +1,73 @@
+import mmap
+import os
+import pathlib
+import pickle
+import struct
+import time
+import zlib
+
+
+class Spool:
+    """ Append-only segment files for records the database did not take.
+    A frame is [length][crc32][pickled record], the header is written
+    after the payload, so a torn write reads as the end of the segment
+    """
+    FRAME = struct.Struct('!II')
+    SUFFIX = '.seg'
+
+    def __init__(self, directory, segment_size=16 << 20):
+        self.directory = pathlib.Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.segment_size = segment_size
+        self._path = None
+        self._file = None
+        self._mmap = None
+        self._offset = 0
+
+    def __bool__(self):
+        return self._path is not None or any(self.segments())
+
+    def segments(self):
+        return sorted(self.directory.glob('*' + self.SUFFIX))
+
+    def append(self, records):
+        for record in records:
+            payload = pickle.dumps(record, protocol=pickle.HIGHEST_PROTOCOL)
+            size = self.FRAME.size + len(payload)
+            if self._mmap is None or self._offset + size + self.FRAME.size > len(self._mmap):
+                self._open_segment(size + self.FRAME.size)
+            start = self._offset + self.FRAME.size
+            self._mmap[start:start + len(payload)] = payload
+            self._mmap[self._offset:start] = self.FRAME.pack(len(payload), zlib.crc32(payload))
+            self._offset += size
+        if self._mmap is not None:
+            self._mmap.flush()
+
+    def seal(self):
+        """ Closes the segment being written, it becomes visible to replay """
+        if self._mmap is not None:
+            self._mmap.flush()
+            self._mmap.close()
+            self._file.close()
+        self._path, self._file, self._mmap, self._offset = None, None, None, 0
+
+    def read(self, path):
+        with open(path, 'rb') as segment:
+            data = segment.read()
+        offset = 0
+        while offset + self.FRAME.size <= len(data):
+            length, crc = self.FRAME.unpack_from(data, offset)
+            payload = data[offset + self.FRAME.size:offset + self.FRAME.size + length]
+            if length == 0 or len(payload) != length or zlib.crc32(payload) != crc:
+                return
+            yield pickle.loads(payload)
+            offset += self.FRAME.size + length
+
+    def _open_segment(self, min_size):
+        self.seal()
+        self._path = self.directory / f'{time.time_ns():020d}{self.SUFFIX}'
+        self._file = open(self._path, 'w+b')
+        self._file.truncate(max(self.segment_size, min_size))
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        self._mmap = mmap.mmap(self._file.fileno(), 0)